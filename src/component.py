@@ -1,20 +1,36 @@
+import hashlib
 import logging
-import dateparser
+import tarfile
+import threading
 import warnings
-import csv
-from datetime import date
-from os import path, mkdir, listdir, rmdir
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, Future, as_completed, wait, FIRST_COMPLETED
+from datetime import date, datetime, timezone
+from os import path, mkdir, listdir, rmdir, remove
 from datetime import timedelta
-from typing import List
+from operator import itemgetter
+from urllib.parse import urlparse
+from typing import List, Iterable, NamedTuple, Callable, Sequence
 from keboola.component.base import ComponentBase, UserException
-from google_search_console import GoogleSearchConsoleClient, ClientError, ClientAuthError
-from keboola.component.dao import OauthCredentials
-from typing import Dict, Tuple, Generator
+from google_search_console import GoogleSearchConsoleClient, ClientError, ClientAuthError, ClientTimeoutError, \
+    split_date_range
+from google_search_console.client import API_ROW_LIMIT, DEFAULT_REQUEST_TIMEOUT
+from google_search_console.rate_limiter import URL_INSPECTION_SITE_QPD
+from google_search_console.metrics import RunMetrics, METRICS_COLUMNS
+from google_search_console.response_cache import ResponseCache, DEFAULT_MAX_SIZE_MB, FINAL_DATA_AGE_DAYS
+from keboola.component.dao import OauthCredentials, TableDefinition, TableMetadata
+from typing import Dict, Tuple, Generator, Optional
 from googleapiclient.errors import HttpError
+from deduplicator import RowDeduplicator
+from query_planner import QueryPlanner, QueryPlan, PLAN_COLUMNS
+from writers import SliceWriter, CsvSliceWriter, GzipCsvSliceWriter, OUTPUT_FORMATS, OUTPUT_FORMAT_CSV, \
+    OUTPUT_FORMAT_CSV_GZIP
 import json
 
 
 KEY_DOMAIN = 'domain'
+KEY_DOMAINS = "domains"
+KEY_ALL_VERIFIED_SITES = "all_verified_sites"
 KEY_OUT_TABLE_NAME = "out_table_name"
 KEY_ENDPOINT = "endpoint"
 KEY_SEARCH_ANALYTICS_DIMENSIONS = "search_analytics_dimensions"
@@ -22,6 +38,11 @@ KEY_DATE_FROM = "date_from"
 KEY_DATE_TO = "date_to"
 KEY_DATE_RANGE = "date_range"
 KEY_SEARCH_TYPE = "search_type"
+KEY_REPORTS = "reports"
+KEY_REPORT_NAME = "name"
+KEY_REPORT_DIMENSIONS = "dimensions"
+KEY_REPORT_SEARCH_TYPE = "search_type"
+KEY_REPORT_OUT_TABLE_NAME = "out_table_name"
 KEY_CLIENT_ID = "appKey"
 KEY_CLIENT_SECRET = "appSecret"
 KEY_REFRESH_TOKEN = "refresh_token"
@@ -29,17 +50,119 @@ KEY_FILTER_GROUPS = "filter_groups"
 KEY_AUTH_DATA = "data"
 KEY_LOADING_OPTIONS = "loading_options"
 KEY_LOADING_OPTIONS_INCREMENTAL = "incremental"
+KEY_LOADING_OPTIONS_INCREMENTAL_FETCHING = "incremental_fetching"
+KEY_LOADING_OPTIONS_REFETCH_WINDOW_DAYS = "refetch_window_days"
+KEY_LOADING_OPTIONS_OUTPUT_FORMAT = "output_format"
 KEY_SERVICE_ACCOUNT = "#service_account_info"
 KEY_INCLUDE_FRESH = "include_fresh"
+KEY_EXTRACTION_OPTIONS = "extraction_options"
+KEY_DATE_SHARD_DAYS = "date_shard_days"
+KEY_MAX_WORKERS = "max_workers"
+KEY_PREFETCH_PAGES = "prefetch_pages"
+KEY_PARTITIONING = "partitioning"
+KEY_PARTITION_ROW_THRESHOLD = "partition_row_threshold"
+KEY_DEDUPLICATION_SPILL_THRESHOLD = "deduplication_spill_threshold"
+KEY_RUN_METRICS = "run_metrics"
+KEY_CHECKPOINTING = "checkpointing"
+KEY_REQUEST_TIMEOUT = "request_timeout"
+KEY_RESPONSE_CACHE = "response_cache"
+KEY_QUERY_PLANNING = "query_planning"
+KEY_RECOMPUTE_CTR = "recompute_ctr"
+KEY_DRY_RUN = "dry_run"
+KEY_RESPONSE_CACHE_SIZE_MB = "response_cache_size_mb"
+KEY_EXPAND_SITEMAP_INDEXES = "expand_sitemap_indexes"
+KEY_URL_INSPECTION = "url_inspection"
+KEY_URL_INSPECTION_URLS = "urls"
+KEY_URL_INSPECTION_MAX_URLS = "max_urls"
+KEY_URL_INSPECTION_CACHE_DAYS = "cache_days"
+KEY_URL_INSPECTION_LANGUAGE_CODE = "language_code"
+
+STATE_RESOLVED_PROPERTIES = "resolved_properties"
+STATE_LAST_FINALIZED_DATES = "last_finalized_dates"
+STATE_CHECKPOINT = "checkpoint"
+STATE_URL_INSPECTIONS = "url_inspections"
+# the access token is encrypted in the state, the owner identifies the credentials it was issued for
+STATE_ACCESS_TOKEN = "#access_token"
+STATE_ACCESS_TOKEN_EXPIRY = "access_token_expiry"
+STATE_ACCESS_TOKEN_OWNER = "access_token_owner"
+
+DEFAULT_MAX_WORKERS = 4
+# Search Console returns at most 50k rows per day and search type, a query reaching this is considered truncated
+DEFAULT_PARTITION_ROW_THRESHOLD = 50000
+# low cardinality dimensions a truncated query is split along, in order of preference
+PARTITION_DIMENSIONS = ["date", "device", "country", "searchAppearance"]
+DEVICE_TYPES = ["DESKTOP", "MOBILE", "TABLET"]
+
+# the response cache is kept between runs as an output file, loaded back through the input mapping of this tag
+RESPONSE_CACHE_TAG = "google-search-console-response-cache"
+RESPONSE_CACHE_FILE_NAME = "google_search_console_response_cache.tar"
+# Storage deletes files that are not permanent after 15 days, an unchanged cache is uploaded again before that
+RESPONSE_CACHE_REUPLOAD_DAYS = 10
+
+SEARCH_ANALYTICS_METRICS = ["clicks", "impressions", "ctr", "position"]
+SEARCH_ANALYTICS_COLUMN_TYPES = {"date": "DATE", "clicks": "INTEGER", "impressions": "INTEGER", "ctr": "FLOAT",
+                                 "position": "FLOAT", "date_downloaded": "DATE"}
 
 SITEMAPS_HEADERS = ["path", "lastSubmitted", "isPending", "isSitemapsIndex", "type", "lastDownloaded", "warnings",
                     "errors"]
+SITEMAPS_CONTENT_HEADERS = ["content_type", "submitted", "indexed"]
+
+URL_INSPECTION_HEADERS = ["inspection_url", "verdict", "coverage_state", "indexing_state", "robots_txt_state",
+                          "page_fetch_state", "last_crawl_time", "crawled_as", "google_canonical", "user_canonical",
+                          "sitemaps", "referring_urls", "mobile_usability_verdict", "mobile_usability_issues",
+                          "rich_results_verdict", "rich_results_types", "amp_verdict", "inspection_result_link"]
+# number of inspected URLs written into one slice
+URL_INSPECTION_SLICE_SIZE = 100
+
+# metrics of API requests are named by the API method, e.g. webmasters.searchanalytics.query
+API_METRICS_PREFIXES = ("webmasters.", "searchconsole.")
 
 SEARCH_TYPES = ["news", "video", "image", "web", "discover", "googleNews"]
 
-REQUIRED_PARAMETERS = [KEY_DOMAIN, KEY_OUT_TABLE_NAME, KEY_ENDPOINT]
+REQUIRED_PARAMETERS = [KEY_OUT_TABLE_NAME, KEY_ENDPOINT]
 REQUIRED_IMAGE_PARS = []
 
+
+class SearchAnalyticsQuery(NamedTuple):
+    query_id: str
+    domain: str
+    date_from: date
+    date_to: date
+    filter_group: Tuple[Dict, ...] = ()
+    # (dimension, value) pairs narrowing a partitioned query
+    partition_filters: Tuple[Tuple[str, str], ...] = ()
+    # first row of the first page, non zero when a checkpointed query is resumed
+    start_row: int = 0
+    # name of the report the query belongs to, empty without multiple reports
+    report: str = ""
+
+    def to_state(self) -> Dict:
+        return {"query_id": self.query_id, "domain": self.domain, "date_from": str(self.date_from),
+                "date_to": str(self.date_to), "filter_group": list(self.filter_group),
+                "partition_filters": [list(partition_filter) for partition_filter in self.partition_filters],
+                "start_row": self.start_row, "report": self.report}
+
+    @classmethod
+    def from_state(cls, query_state: Dict) -> "SearchAnalyticsQuery":
+        return cls(query_state["query_id"], query_state["domain"], date.fromisoformat(query_state["date_from"]),
+                   date.fromisoformat(query_state["date_to"]), tuple(query_state["filter_group"]),
+                   tuple(tuple(partition_filter) for partition_filter in query_state["partition_filters"]),
+                   query_state["start_row"], query_state.get("report", ""))
+
+
+class SearchAnalyticsReport(NamedTuple):
+    name: str
+    dimensions: List[str]
+    search_type: Optional[str]
+    out_table_name: str
+
+
+class SearchAnalyticsOutput(NamedTuple):
+    report: SearchAnalyticsReport
+    table: TableDefinition
+    slice_writer: SliceWriter
+
+
 # Ignore dateparser warnings regarding pytz
 warnings.filterwarnings(
     "ignore",
@@ -57,57 +180,603 @@ class Component(ComponentBase):
         self.out_table_name = "".join([self.out_table_name, ".csv"])
         self.endpoint = params.get(KEY_ENDPOINT)
         self.domain = params.get(KEY_DOMAIN)
+        self.domains = params.get(KEY_DOMAINS, [])
+        self.all_verified_sites = params.get(KEY_ALL_VERIFIED_SITES, False)
+        self.validate_domains(self.domain, self.domains, self.all_verified_sites)
+        # batch mode writes several domains into one table, so the domain becomes part of the primary key
+        self.batch_mode = bool(self.domains or self.all_verified_sites)
         self.filter_groups = params.get(KEY_FILTER_GROUPS, [[]])
 
+        loading_options = params.get(KEY_LOADING_OPTIONS, {})
+        self.incremental = loading_options.get(KEY_LOADING_OPTIONS_INCREMENTAL, 0)
+        self.incremental_fetching = loading_options.get(KEY_LOADING_OPTIONS_INCREMENTAL_FETCHING, False)
+        self.refetch_window_days = loading_options.get(KEY_LOADING_OPTIONS_REFETCH_WINDOW_DAYS,
+                                                       FINAL_DATA_AGE_DAYS)
+        self.output_format = loading_options.get(KEY_LOADING_OPTIONS_OUTPUT_FORMAT, OUTPUT_FORMAT_CSV)
+        self.validate_loading_options(self.incremental, self.incremental_fetching, self.refetch_window_days,
+                                      self.output_format)
+
+        extraction_options = params.get(KEY_EXTRACTION_OPTIONS, {})
+        self.date_shard_days = extraction_options.get(KEY_DATE_SHARD_DAYS, 0)
+        self.max_workers = extraction_options.get(KEY_MAX_WORKERS, DEFAULT_MAX_WORKERS)
+        self.prefetch_pages = extraction_options.get(KEY_PREFETCH_PAGES, 0)
+        self.partitioning = extraction_options.get(KEY_PARTITIONING, False)
+        self.partition_row_threshold = extraction_options.get(KEY_PARTITION_ROW_THRESHOLD,
+                                                              DEFAULT_PARTITION_ROW_THRESHOLD)
+        self.deduplication_spill_threshold = extraction_options.get(KEY_DEDUPLICATION_SPILL_THRESHOLD, 0)
+        self.validate_extraction_options(self.date_shard_days, self.max_workers, self.prefetch_pages,
+                                         self.partition_row_threshold, self.deduplication_spill_threshold)
+        self.run_metrics = extraction_options.get(KEY_RUN_METRICS, False)
+        self.checkpointing = extraction_options.get(KEY_CHECKPOINTING, False)
+        self.request_timeout = extraction_options.get(KEY_REQUEST_TIMEOUT, DEFAULT_REQUEST_TIMEOUT)
+        if not isinstance(self.request_timeout, (int, float)) or self.request_timeout <= 0:
+            raise UserException("Request timeout must be a positive number of seconds")
+        self.query_planning = extraction_options.get(KEY_QUERY_PLANNING, False)
+        self.recompute_ctr = extraction_options.get(KEY_RECOMPUTE_CTR, False)
+        self.dry_run = extraction_options.get(KEY_DRY_RUN, False)
+        self.response_cache = extraction_options.get(KEY_RESPONSE_CACHE, False)
+        self.response_cache_size_mb = extraction_options.get(KEY_RESPONSE_CACHE_SIZE_MB, DEFAULT_MAX_SIZE_MB)
+        if not isinstance(self.response_cache_size_mb, (int, float)) or self.response_cache_size_mb <= 0:
+            raise UserException("Response cache size must be a positive number of megabytes")
+        # creation time of the latest loaded response cache archive in Storage
+        self.response_cache_uploaded: Optional[datetime] = None
+        if self.checkpointing and not self.incremental:
+            raise UserException("Checkpointing requires the Incremental Update load type, otherwise a resumed run "
+                                "would overwrite the data loaded before the checkpoint")
+        self.deduplicator: Optional[RowDeduplicator] = None
+        # queries that did not finish yet by query id, kept up to date with the rows already written
+        self.unfinished_queries: Dict[str, SearchAnalyticsQuery] = {}
+        self.stop_requested = threading.Event()
+
         self.service_account_info = params.get(KEY_SERVICE_ACCOUNT, None)
+        self.state = {}
 
     def run(self) -> None:
         client_id_credentials = self.configuration.oauth_credentials
 
+        self.state = self.get_state_file()
+        access_token_owner = self.get_access_token_owner(client_id_credentials)
+        access_token, expiry = self.get_cached_access_token(access_token_owner)
+        response_cache = None
+        if self.response_cache and self.endpoint == "Search analytics":
+            response_cache = self.load_response_cache()
+
         if self.service_account_info:
-            gsc_client = self.get_gsc_client(service_account_info=self.service_account_info)
+            gsc_client = self.get_gsc_client(service_account_info=self.service_account_info,
+                                             request_timeout=self.request_timeout,
+                                             access_token=access_token, expiry=expiry,
+                                             response_cache=response_cache)
         else:
-            gsc_client = self.get_gsc_client(client_id_credentials=client_id_credentials)
+            gsc_client = self.get_gsc_client(client_id_credentials=client_id_credentials,
+                                             request_timeout=self.request_timeout,
+                                             access_token=access_token, expiry=expiry,
+                                             response_cache=response_cache)
 
         logging.getLogger("googleapiclient.http").disabled = True
 
-        if self.endpoint == "Search analytics":
-            self.fetch_and_write_search_analytics_data(gsc_client)
+        for domain, site_url in self.state.get(STATE_RESOLVED_PROPERTIES, {}).items():
+            gsc_client.set_resolved_property(domain, site_url)
 
-        elif self.endpoint == "Sitemaps":
-            sitemap_data = self.get_sitemaps_data(gsc_client)
-            self.write_results(sitemap_data)
+        domains = self.get_domains(gsc_client)
 
+        try:
+            if self.endpoint == "Search analytics":
+                self.fetch_and_write_search_analytics_data(gsc_client, domains)
+
+            elif self.endpoint == "Sitemaps":
+                self.fetch_and_write_sitemaps_data(gsc_client, domains)
+
+            elif self.endpoint == "URL inspection":
+                self.fetch_and_write_url_inspection_data(gsc_client, domains)
+
+            else:
+                raise ValueError("Endpoint selected does not exist")
+        finally:
+            logging.info(self.get_run_metrics_summary(gsc_client.metrics))
+
+        if self.run_metrics:
+            self.write_run_metrics(gsc_client.metrics)
+        if response_cache is not None:
+            self.save_response_cache(response_cache)
+
+        self.state[STATE_RESOLVED_PROPERTIES] = gsc_client.resolved_properties
+        access_token, expiry = gsc_client.access_token
+        if access_token and expiry:
+            self.state.update({STATE_ACCESS_TOKEN: access_token, STATE_ACCESS_TOKEN_EXPIRY: expiry.isoformat(),
+                               STATE_ACCESS_TOKEN_OWNER: access_token_owner})
+        self.write_state_file(self.state)
+
+    def get_access_token_owner(self, client_id_credentials: Optional[OauthCredentials]) -> str:
+        if self.service_account_info:
+            secret = self.service_account_info
+        elif client_id_credentials:
+            secret = json.dumps([client_id_credentials[KEY_CLIENT_ID],
+                                 client_id_credentials[KEY_AUTH_DATA][KEY_REFRESH_TOKEN]])
         else:
-            raise ValueError("Endpoint selected does not exist")
+            return ""
+        return hashlib.sha256(secret.encode("utf-8")).hexdigest()
 
-    def fetch_and_write_search_analytics_data(self, gsc_client: GoogleSearchConsoleClient) -> None:
+    def get_cached_access_token(self, access_token_owner: str) -> Tuple[Optional[str], Optional[datetime]]:
+        """Returns the access token of the previous run if it was issued for the same credentials."""
+        if not access_token_owner or self.state.get(STATE_ACCESS_TOKEN_OWNER) != access_token_owner:
+            return None, None
+        try:
+            return self.state[STATE_ACCESS_TOKEN], datetime.fromisoformat(self.state[STATE_ACCESS_TOKEN_EXPIRY])
+        except (KeyError, TypeError, ValueError):
+            return None, None
+
+    def get_domains(self, gsc_client: GoogleSearchConsoleClient) -> List[str]:
+        if self.all_verified_sites:
+            try:
+                domains = gsc_client.get_verified_sites()
+            except HttpError as http_error:
+                raise UserException(f"Could not list verified sites: {http_error}") from http_error
+            if not domains:
+                raise UserException("No verified sites found, make sure you have sufficient rights")
+            logging.info(f"Extracting data of {len(domains)} verified sites")
+            return domains
+        domains = [self.domain] if self.domain else []
+        for domain in self.domains:
+            if domain not in domains:
+                domains.append(domain)
+        return domains
+
+    def fetch_and_write_search_analytics_data(self, gsc_client: GoogleSearchConsoleClient, domains: List[str]) -> None:
         params = self.configuration.parameters
-        search_analytics_dimensions = self.parse_list_from_string(params.get(KEY_SEARCH_ANALYTICS_DIMENSIONS, ""))
-        incremental = params.get(KEY_LOADING_OPTIONS, {}).get(KEY_LOADING_OPTIONS_INCREMENTAL, 0)
+        reports = self.get_search_analytics_reports()
         date_downloaded = date.today()
-        table = self.create_out_table_definition(self.out_table_name,
-                                                 primary_key=search_analytics_dimensions,
-                                                 incremental=incremental,
-                                                 is_sliced=True)
-        self.create_sliced_directory(table.full_path)
-        fieldnames = []
+        date_from, date_to = self.get_date_range(params.get(KEY_DATE_FROM),
+                                                 params.get(KEY_DATE_TO),
+                                                 params.get(KEY_DATE_RANGE))
+        logging.info(f"Filters set as {self.filter_groups}")
+        # every filter group is a separate query, rows matching several groups are de-duplicated
+        filter_groups = [tuple(filter_group) for filter_group in self.filter_groups] or [()]
+        if self.dry_run:
+            self.write_query_plan(self.plan_search_analytics_queries(gsc_client, domains, date_from, date_to,
+                                                                     reports, filter_groups))
+            return
+
+        outputs = {report.name: self.create_search_analytics_output(report) for report in reports}
+        if len(filter_groups) > 1:
+            self.deduplicator = RowDeduplicator(self.deduplication_spill_threshold, self.data_folder_path)
+
+        checkpoint_key = self.get_checkpoint_key(domains)
+        checkpoint = self.state.pop(STATE_CHECKPOINT, None)
+        if checkpoint and self.checkpointing and checkpoint["key"] == checkpoint_key:
+            # the digests of the rows loaded before the checkpoint are not stored, rows of several filter groups may
+            # be written again and are de-duplicated by the primary key of the incrementally loaded table
+            queries = [SearchAnalyticsQuery.from_state(query_state) for query_state in checkpoint["queries"]]
+            date_to = date.fromisoformat(checkpoint["date_to"])
+            logging.info(f"Resuming {len(queries)} unfinished queries from the checkpoint of the previous run")
+        else:
+            if checkpoint and self.checkpointing:
+                logging.warning("Configuration changed since the checkpoint was stored, starting from scratch")
+            plans = []
+            if self.query_planning:
+                plans = self.plan_search_analytics_queries(gsc_client, domains, date_from, date_to, reports,
+                                                           filter_groups)
+            queries = []
+            for report in reports:
+                shard_days = {plan.domain: plan.shard_days for plan in plans
+                              if plan.report == report.name and "date" in report.dimensions}
+                queries.extend(self.get_search_analytics_queries(domains, date_from, date_to, report.dimensions,
+                                                                 report.search_type, filter_groups, report.name,
+                                                                 first_query_id=len(queries),
+                                                                 shard_days=shard_days))
+        if len(queries) > 1:
+            logging.info(f"Fetching {len(queries)} queries using {min(self.max_workers, len(queries))} workers")
+
+        def fetch_and_write(query: SearchAnalyticsQuery) -> Optional[List[SearchAnalyticsQuery]]:
+            report = outputs[query.report].report
+            return self.fetch_and_write_search_analytics_query(gsc_client, outputs[query.report].table.full_path,
+                                                               outputs[query.report].slice_writer, query,
+                                                               report.dimensions, report.search_type,
+                                                               date_downloaded)
+
         try:
-            for i, search_data_slice in enumerate(self.get_search_analytics_data(gsc_client)):
-                parsed_slice = self.parse_search_analytics_data(search_data_slice, search_analytics_dimensions)
-                slice_path = path.join(table.full_path, str(i))
-                fieldnames = list(parsed_slice[0].keys())
-                fieldnames.append("date_downloaded")
-                fieldnames.append("domain")
-                self.write_results_to_out_table(slice_path, fieldnames, parsed_slice, date_downloaded)
-            table.columns = fieldnames
-            if len(listdir(table.full_path)) != 0:
-                self.write_tabledef_manifest(table)
+            try:
+                self.run_queries(queries, fetch_and_write)
+            except (ClientError, HttpError, OSError) as error:
+                if not self.checkpointing:
+                    raise
+                self.state[STATE_CHECKPOINT] = {"key": checkpoint_key, "date_to": str(date_to),
+                                                "queries": [query.to_state() for query in
+                                                            self.unfinished_queries.values()]}
+                logging.warning(f"Extraction stopped by an error, the data fetched so far is loaded and "
+                                f"{len(self.unfinished_queries)} unfinished queries are resumed in the next run: "
+                                f"{error}")
             else:
-                logging.warning("No Data Found")
-                rmdir(table.full_path)
+                if self.incremental_fetching:
+                    for report in reports:
+                        for domain in domains:
+                            state_key = self.get_last_finalized_date_key(domain, report.dimensions,
+                                                                         report.search_type)
+                            self.update_last_finalized_date(state_key, date_to)
+            for output in outputs.values():
+                self.write_search_analytics_manifest(output)
         except (ClientError, HttpError, ClientAuthError) as cl_error:
             raise UserException(cl_error) from cl_error
+        finally:
+            if self.deduplicator:
+                self.deduplicator.close()
+
+    def get_search_analytics_reports(self) -> List[SearchAnalyticsReport]:
+        """Returns the configured reports, a configuration without reports is a single report of the row options."""
+        params = self.configuration.parameters
+        report_settings = params.get(KEY_REPORTS) or [
+            {KEY_REPORT_NAME: "", KEY_REPORT_DIMENSIONS: params.get(KEY_SEARCH_ANALYTICS_DIMENSIONS, ""),
+             KEY_REPORT_SEARCH_TYPE: params.get(KEY_SEARCH_TYPE)}]
+        reports = []
+        for settings in report_settings:
+            name = settings.get(KEY_REPORT_NAME, "")
+            if params.get(KEY_REPORTS):
+                self.validate_table_name(name)
+            table_name = settings.get(KEY_REPORT_OUT_TABLE_NAME) or "_".join(
+                filter(None, [self.out_table_name[:-len(".csv")], name]))
+            self.validate_table_name(table_name)
+            report = SearchAnalyticsReport(name, self.parse_list_from_string(settings.get(KEY_REPORT_DIMENSIONS, "")),
+                                           settings.get(KEY_REPORT_SEARCH_TYPE), f"{table_name}.csv")
+            self.validate_search_analytics_parameters(report.dimensions, report.search_type)
+            if self.incremental_fetching and "date" not in report.dimensions:
+                raise UserException(f"Incremental fetching requires the 'date' dimension in every report, "
+                                    f"report '{name}' does not have it")
+            reports.append(report)
+        for attribute, description in [("name", "name"), ("out_table_name", "output table")]:
+            values = [getattr(report, attribute) for report in reports]
+            if len(set(values)) != len(values):
+                raise UserException(f"Every report must have a unique {description}")
+        return reports
+
+    def create_search_analytics_output(self, report: SearchAnalyticsReport) -> SearchAnalyticsOutput:
+        primary_key = report.dimensions + ["domain"] if self.batch_mode else report.dimensions
+        fieldnames = report.dimensions + SEARCH_ANALYTICS_METRICS + ["date_downloaded", "domain"]
+        column_types = {column: data_type for column, data_type in SEARCH_ANALYTICS_COLUMN_TYPES.items()
+                        if column in fieldnames}
+        table_metadata = TableMetadata()
+        table_metadata.add_column_data_types(column_types)
+        table = self.create_out_table_definition(report.out_table_name,
+                                                 primary_key=primary_key,
+                                                 incremental=self.incremental,
+                                                 table_metadata=table_metadata,
+                                                 is_sliced=True)
+        table.columns = fieldnames
+        self.create_sliced_directory(table.full_path)
+        return SearchAnalyticsOutput(report, table, self.get_slice_writer())
+
+    def write_search_analytics_manifest(self, output: SearchAnalyticsOutput) -> None:
+        if len(listdir(output.table.full_path)) != 0:
+            self.write_tabledef_manifest(output.table)
+        else:
+            logging.warning(f"No Data Found for {output.report.out_table_name}")
+            rmdir(output.table.full_path)
+
+    def get_search_analytics_queries(self, domains: List[str], date_from: date, date_to: date,
+                                     search_analytics_dimensions: List[str], search_type: str,
+                                     filter_groups: List[Tuple[Dict, ...]], report: str = "",
+                                     first_query_id: int = 0,
+                                     shard_days: Optional[Dict[str, int]] = None) -> List[SearchAnalyticsQuery]:
+        """
+        Query ids are numbered from first_query_id, so the queries of all reports have unique ids. shard_days
+        overrides the configured date shard size per domain.
+        """
+        queries = []
+        for domain in domains:
+            domain_date_from = self.get_domain_date_from(domain, date_from, search_analytics_dimensions, search_type)
+            if domain_date_from <= date_to:
+                for shard_from, shard_to in self.get_date_shards(domain_date_from, date_to,
+                                                                 search_analytics_dimensions,
+                                                                 (shard_days or {}).get(domain)):
+                    for filter_group in filter_groups:
+                        queries.append(SearchAnalyticsQuery(str(first_query_id + len(queries)), domain, shard_from,
+                                                            shard_to, filter_group, report=report))
+        return queries
+
+    def get_domain_date_from(self, domain: str, date_from: date, search_analytics_dimensions: List[str],
+                             search_type: str) -> date:
+        if not self.incremental_fetching:
+            return date_from
+        state_key = self.get_last_finalized_date_key(domain, search_analytics_dimensions, search_type)
+        return self.get_incremental_date_from(date_from, state_key)
+
+    def plan_search_analytics_queries(self, gsc_client: GoogleSearchConsoleClient, domains: List[str],
+                                      date_from: date, date_to: date, reports: List[SearchAnalyticsReport],
+                                      filter_groups: List[Tuple[Dict, ...]]) -> List[QueryPlan]:
+        """Estimates the size of every report and domain, picks the date shards and sets the worker count."""
+        planner = QueryPlanner(gsc_client, self.configuration.parameters.get(KEY_INCLUDE_FRESH, False))
+        plans = []
+        try:
+            for report in reports:
+                for domain in domains:
+                    domain_date_from = self.get_domain_date_from(domain, date_from, report.dimensions,
+                                                                 report.search_type)
+                    if domain_date_from <= date_to:
+                        plans.append(planner.plan(report.name, domain, domain_date_from, date_to, report.dimensions,
+                                                  report.search_type, filter_groups))
+        except ClientError as client_error:
+            raise UserException(client_error) from client_error
+        for plan in plans:
+            logging.info(f"Plan for {plan.domain}{f' report {plan.report}' if plan.report else ''}: "
+                         f"{plan.estimated_rows_per_day} rows per day on {plan.days_with_data} days with data, "
+                         f"{plan.queries} queries of {plan.shard_days} days, {plan.expected_requests} requests")
+            if plan.estimated_rows_per_day >= API_ROW_LIMIT and not self.partitioning:
+                logging.warning(f"Days of {plan.domain} have more than {API_ROW_LIMIT} rows and may be truncated, "
+                                f"consider enabling partitioning")
+        queries = sum(plan.queries for plan in plans)
+        expected_requests = sum(plan.expected_requests for plan in plans)
+        planned_workers = planner.get_workers(queries)
+        if planned_workers < self.max_workers:
+            logging.info(f"Lowering the parallel requests from {self.max_workers} to {planned_workers} "
+                         f"planned from the probe latency")
+        self.max_workers = min(self.max_workers, planned_workers)
+        latency = planner.probe_seconds / planner.probe_requests if planner.probe_requests else 0.0
+        logging.info(f"Query plan: {queries} queries, {expected_requests} expected requests using "
+                     f"{self.max_workers} workers, about "
+                     f"{planner.get_expected_seconds(expected_requests, self.max_workers, latency):.0f} s "
+                     f"({planner.probe_requests} probe requests, {latency:.2f} s average latency)")
+        return plans
+
+    def write_query_plan(self, plans: List[QueryPlan]) -> None:
+        table = self.create_out_table_definition(f"{self.out_table_name[:-len('.csv')]}_query_plan.csv",
+                                                 columns=PLAN_COLUMNS, primary_key=["report", "domain"])
+        CsvSliceWriter().write(table.full_path, (list(plan) for plan in plans))
+        self.write_tabledef_manifest(table)
+
+    def get_checkpoint_key(self, domains: List[str]) -> str:
+        """Identifies the configuration a checkpoint belongs to, a checkpoint of a different one is not resumed."""
+        params = self.configuration.parameters
+        configuration = [domains, params.get(KEY_SEARCH_ANALYTICS_DIMENSIONS), params.get(KEY_SEARCH_TYPE),
+                         self.filter_groups, params.get(KEY_DATE_RANGE), params.get(KEY_DATE_FROM),
+                         params.get(KEY_DATE_TO), params.get(KEY_INCLUDE_FRESH, False), self.date_shard_days]
+        if params.get(KEY_REPORTS):
+            configuration.append(params[KEY_REPORTS])
+        return hashlib.sha1(json.dumps(configuration, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def run_queries(self, queries: List[SearchAnalyticsQuery],
+                    fetch_and_write: Callable[[SearchAnalyticsQuery], Optional[List[SearchAnalyticsQuery]]]) -> None:
+        """
+        Runs the queries on the worker pool, follow-up queries returned by a finished query are submitted too.
+
+        After the first error no further queries are started and the running ones stop at the next page, the queries
+        left unfinished remain in unfinished_queries.
+        """
+        lock = threading.Lock()
+        self.unfinished_queries = {query.query_id: query for query in queries}
+
+        def run_query(query: SearchAnalyticsQuery) -> List[SearchAnalyticsQuery]:
+            if self.stop_requested.is_set():
+                return []
+            follow_ups = fetch_and_write(query)
+            if follow_ups is None:
+                return []
+            with lock:
+                del self.unfinished_queries[query.query_id]
+                self.unfinished_queries.update((follow_up.query_id, follow_up) for follow_up in follow_ups)
+            return follow_ups
+
+        with ThreadPoolExecutor(max_workers=max(min(self.max_workers, len(queries)), 1)) as executor:
+            pending = {executor.submit(run_query, query) for query in queries}
+            try:
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.update(executor.submit(run_query, follow_up) for follow_up in future.result())
+            except Exception:
+                self.stop_requested.set()
+                for future in pending:
+                    future.cancel()
+                raise
+
+    def fetch_and_write_search_analytics_query(self, gsc_client: GoogleSearchConsoleClient, table_path: str,
+                                               slice_writer: SliceWriter, query: SearchAnalyticsQuery,
+                                               search_analytics_dimensions: List[str], search_type: str,
+                                               date_downloaded: date) -> Optional[List[SearchAnalyticsQuery]]:
+        """
+        Writes the query results as slices, returns partitions of the query instead if its results are truncated.
+        Returns None if the query was stopped before all pages were written.
+        """
+        paged_data = self.get_search_analytics_data(gsc_client, query, search_analytics_dimensions, search_type)
+        slice_paths = []
+        registered_digests = []
+        # the pages before the start row were full
+        row_count = query.start_row
+        day_row_counts = Counter()
+        first_page = query.start_row // API_ROW_LIMIT
+        try:
+            for i, search_data_slice in enumerate(paged_data, first_page):
+                if self.stop_requested.is_set():
+                    return None
+                row_count += len(search_data_slice)
+                if self.partitioning and "date" in search_analytics_dimensions:
+                    date_index = search_analytics_dimensions.index("date")
+                    day_row_counts.update(row["keys"][date_index] for row in search_data_slice)
+                if self.partitioning and self.is_saturated(query, search_analytics_dimensions, row_count,
+                                                           day_row_counts):
+                    partitions = self.get_partition_queries(gsc_client, query, search_analytics_dimensions,
+                                                            search_type)
+                    if partitions:
+                        logging.info(f"Query for {query.domain} from {query.date_from} to {query.date_to} "
+                                     f"returned at least {row_count} rows, splitting it into {len(partitions)} "
+                                     f"partitions")
+                        self.discard_slices(slice_paths, registered_digests)
+                        return [partition._replace(start_row=0) for partition in partitions]
+                if self.deduplicator:
+                    # reports with the same dimensions do not share rows, the digests are scoped by the report
+                    search_data_slice, digests = self.deduplicator.filter_new(f"{query.report}|{query.domain}",
+                                                                              search_data_slice)
+                    if self.partitioning or "date" in search_analytics_dimensions:
+                        registered_digests.extend(digests)
+                if search_data_slice:
+                    with gsc_client.metrics.measure("parse_search_analytics_data", query.domain) as measurement:
+                        # a page is parsed at once, so parsing and writing can be timed separately
+                        columns = self.parse_search_analytics_page(search_data_slice,
+                                                                   len(search_analytics_dimensions),
+                                                                   self.recompute_ctr)
+                        measurement.rows = len(search_data_slice)
+                    slice_path = slice_writer.get_slice_path(table_path, f"{query.query_id}_{i}")
+                    with gsc_client.metrics.measure("write_results_to_out_table", query.domain) as measurement:
+                        self.write_columns_to_out_table(slice_path, columns, date_downloaded, query.domain,
+                                                        slice_writer)
+                        measurement.rows = len(search_data_slice)
+                    slice_paths.append(slice_path)
+                # the page is written, a resumed query continues with the next one
+                self.unfinished_queries[query.query_id] = query._replace(start_row=(i + 1) * API_ROW_LIMIT)
+        except ClientTimeoutError:
+            halves = self.get_bisected_queries(query, search_analytics_dimensions)
+            if not halves:
+                raise
+            logging.warning(f"Query for {query.domain} from {query.date_from} to {query.date_to} timed out, "
+                            f"fetching the halves of the date range separately")
+            self.discard_slices(slice_paths, registered_digests)
+            return halves
+        finally:
+            paged_data.close()
+        return []
+
+    def is_saturated(self, query: SearchAnalyticsQuery, search_analytics_dimensions: List[str], row_count: int,
+                     day_row_counts: Dict[str, int]) -> bool:
+        """
+        The API truncates the rows of every day, so a multi-day query is saturated once one of its days is, not by
+        its cumulative row count. Rows of the pages fetched before a resume are not attributed to days, they count
+        into the average rows per day instead.
+        """
+        if query.date_from == query.date_to or "date" not in search_analytics_dimensions:
+            # a single day, or rows aggregated over the date range
+            return row_count >= self.partition_row_threshold
+        day_threshold = min(self.partition_row_threshold, API_ROW_LIMIT)
+        days = (query.date_to - query.date_from).days + 1
+        return max(day_row_counts.values(), default=0) >= day_threshold or row_count / days >= day_threshold
+
+    def discard_slices(self, slice_paths: List[str], digests: List[bytes]) -> None:
+        """Removes slices of a query that is replaced by narrower queries, so their rows can be written again."""
+        for slice_path in slice_paths:
+            remove(slice_path)
+        if self.deduplicator:
+            self.deduplicator.forget(digests)
+
+    @staticmethod
+    def get_bisected_queries(query: SearchAnalyticsQuery,
+                             search_analytics_dimensions: List[str]) -> List[SearchAnalyticsQuery]:
+        # without the date dimension the halves would aggregate different date ranges than the query
+        if "date" not in search_analytics_dimensions or query.date_from >= query.date_to:
+            return []
+        first_half_to = query.date_from + (query.date_to - query.date_from) // 2
+        return [query._replace(query_id=f"{query.query_id}-0", date_to=first_half_to, start_row=0),
+                query._replace(query_id=f"{query.query_id}-1", date_from=first_half_to + timedelta(days=1),
+                               start_row=0)]
+
+    def get_partition_queries(self, gsc_client: GoogleSearchConsoleClient, query: SearchAnalyticsQuery,
+                              search_analytics_dimensions: List[str], search_type: str) -> List[SearchAnalyticsQuery]:
+        partitioned_dimensions = [dimension for dimension, _ in query.partition_filters]
+        for dimension in PARTITION_DIMENSIONS:
+            # splitting along a dimension that is not in the output would produce rows with duplicate keys
+            if dimension not in search_analytics_dimensions or dimension in partitioned_dimensions:
+                continue
+            if dimension == "date":
+                if query.date_from < query.date_to:
+                    return [query._replace(query_id=f"{query.query_id}-{i}", date_from=day, date_to=day)
+                            for i, (day, _) in enumerate(split_date_range(query.date_from, query.date_to, 1))]
+                continue
+            if dimension == "device":
+                values = DEVICE_TYPES
+            else:
+                values = self.get_dimension_values(gsc_client, query, dimension, search_type)
+            if len(values) > 1:
+                return [query._replace(query_id=f"{query.query_id}-{i}",
+                                       partition_filters=query.partition_filters + ((dimension, value),))
+                        for i, value in enumerate(values)]
+        logging.warning(f"Query for {query.domain} from {query.date_from} to {query.date_to} may be truncated by the "
+                        f"API row limit and cannot be partitioned further")
+        return []
+
+    def get_dimension_values(self, gsc_client: GoogleSearchConsoleClient, query: SearchAnalyticsQuery,
+                             dimension: str, search_type: str) -> List[str]:
+        # the values are listed from the first row, also for a query resumed from a checkpoint
+        paged_data = self.get_search_analytics_data(gsc_client, query._replace(start_row=0), [dimension], search_type)
+        return [row["keys"][0] for page in paged_data for row in page]
+
+    def get_date_shards(self, date_from: date, date_to: date, search_analytics_dimensions: List[str],
+                        shard_days: Optional[int] = None) -> List[Tuple[date, date]]:
+        shard_days = shard_days or self.date_shard_days
+        if not shard_days:
+            return [(date_from, date_to)]
+        if "date" not in search_analytics_dimensions:
+            logging.warning("Date sharding requires the 'date' dimension, otherwise the shards would aggregate "
+                            "different date ranges. Fetching the whole date range at once.")
+            return [(date_from, date_to)]
+        return split_date_range(date_from, date_to, shard_days)
+
+    @staticmethod
+    def get_last_finalized_date_key(domain: str, search_analytics_dimensions: List[str], search_type: str) -> str:
+        return "|".join([domain, ",".join(search_analytics_dimensions), search_type or ""])
+
+    def get_incremental_date_from(self, date_from: date, state_key: str) -> date:
+        last_finalized_date = self.state.get(STATE_LAST_FINALIZED_DATES, {}).get(state_key)
+        if not last_finalized_date:
+            logging.info("No finalized date found in state, fetching the whole configured date range")
+            return date_from
+        incremental_date_from = max(date_from, date.fromisoformat(last_finalized_date) + timedelta(days=1))
+        logging.info(f"Data is final up to {last_finalized_date}, fetching data from {incremental_date_from}")
+        return incremental_date_from
+
+    def update_last_finalized_date(self, state_key: str, date_to: date) -> None:
+        last_finalized_dates = self.state.setdefault(STATE_LAST_FINALIZED_DATES, {})
+        finalized_date = min(date_to, date.today() - timedelta(days=self.refetch_window_days))
+        if state_key in last_finalized_dates:
+            finalized_date = max(finalized_date, date.fromisoformat(last_finalized_dates[state_key]))
+        last_finalized_dates[state_key] = str(finalized_date)
+
+    @staticmethod
+    def wait_for_futures(futures: List[Future]) -> None:
+        try:
+            for future in as_completed(futures):
+                future.result()
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def get_slice_writer(self) -> SliceWriter:
+        if self.output_format == OUTPUT_FORMAT_CSV_GZIP:
+            return GzipCsvSliceWriter()
+        return CsvSliceWriter()
+
+    def load_response_cache(self) -> ResponseCache:
+        """Creates the response cache, filled with the archive of the previous run if it is in the input files."""
+        response_cache = ResponseCache(max_bytes=int(self.response_cache_size_mb * 2 ** 20))
+        archives = self.get_input_files_definitions(tags=[RESPONSE_CACHE_TAG])
+        if not archives:
+            logging.info(f"No response cache found in the input files tagged {RESPONSE_CACHE_TAG}, starting empty")
+        for archive in archives:
+            try:
+                response_cache.load_archive(archive.full_path)
+            except (OSError, tarfile.TarError) as error:
+                logging.warning(f"Could not load the response cache {archive.name}: {error}")
+                continue
+            if archive.created and (not self.response_cache_uploaded or archive.created > self.response_cache_uploaded):
+                self.response_cache_uploaded = archive.created
+        logging.info(f"Loaded {response_cache.size / 2 ** 20:.1f} MB of cached responses")
+        return response_cache
+
+    def save_response_cache(self, response_cache: ResponseCache) -> None:
+        """
+        Uploads the cache if responses were added, or if the loaded archive is about to expire in Storage. Otherwise
+        the archive in the input files is still the latest.
+        """
+        logging.info(f"Response cache served {response_cache.hits} of {response_cache.hits + response_cache.misses} "
+                     f"cacheable requests")
+        try:
+            reupload_before = datetime.now(timezone.utc) - timedelta(days=RESPONSE_CACHE_REUPLOAD_DAYS)
+            expiring = self.response_cache_uploaded is not None and self.response_cache_uploaded <= reupload_before
+            if not response_cache.writes and not expiring:
+                logging.info("No new responses were cached, the response cache is not saved")
+                return
+            file_definition = self.create_out_file_definition(RESPONSE_CACHE_FILE_NAME, tags=[RESPONSE_CACHE_TAG])
+            response_cache.save_archive(file_definition.full_path)
+            self.write_filedef_manifest(file_definition)
+            logging.info(f"Saved {response_cache.writes} new cached responses, "
+                         f"{response_cache.size / 2 ** 20:.1f} MB in total")
+        finally:
+            response_cache.close()
 
     @staticmethod
     def create_sliced_directory(table_path: str) -> None:
@@ -116,8 +785,10 @@ class Component(ComponentBase):
             mkdir(table_path)
 
     @staticmethod
-    def get_gsc_client(client_id_credentials: OauthCredentials = None, service_account_info: str = "")\
-            -> GoogleSearchConsoleClient:
+    def get_gsc_client(client_id_credentials: OauthCredentials = None, service_account_info: str = "",
+                       request_timeout: float = DEFAULT_REQUEST_TIMEOUT, access_token: Optional[str] = None,
+                       expiry: Optional[datetime] = None,
+                       response_cache: Optional[ResponseCache] = None) -> GoogleSearchConsoleClient:
         if service_account_info:
             try:
                 service_account_dict = json.loads(service_account_info)
@@ -125,7 +796,9 @@ class Component(ComponentBase):
                 raise UserException("Cannot parse service account json.")
 
             try:
-                return GoogleSearchConsoleClient.from_service_account(service_account_dict)
+                return GoogleSearchConsoleClient.from_service_account(service_account_dict, access_token, expiry,
+                                                                      request_timeout=request_timeout,
+                                                                      response_cache=response_cache)
             except ClientError as client_error:
                 raise UserException(client_error) from client_error
         elif client_id_credentials:
@@ -134,83 +807,255 @@ class Component(ComponentBase):
             refresh_token = client_id_credentials[KEY_AUTH_DATA][KEY_REFRESH_TOKEN]
 
             try:
-                return GoogleSearchConsoleClient.from_auth_code(client_id, client_secret, refresh_token)
+                return GoogleSearchConsoleClient.from_auth_code(client_id, client_secret, refresh_token,
+                                                                access_token=access_token, expiry=expiry,
+                                                                request_timeout=request_timeout,
+                                                                response_cache=response_cache)
             except ClientError as client_error:
                 raise UserException(client_error) from client_error
         else:
             raise UserException(
                 "Component is not authorized, please authorize the app in the authorization configuration ")
 
-    def write_results(self, data: List[Dict]) -> None:
-        fieldnames = list(data[0].keys())
-        fieldnames.append("date_downloaded")
-        fieldnames.append("domain")
+    def fetch_and_write_sitemaps_data(self, gsc_client: GoogleSearchConsoleClient, domains: List[str]) -> None:
+        expand_indexes = self.configuration.parameters.get(KEY_EXPAND_SITEMAP_INDEXES, False)
+        fieldnames = SITEMAPS_HEADERS + SITEMAPS_CONTENT_HEADERS + ["date_downloaded", "domain"]
+        if expand_indexes:
+            fieldnames.insert(len(SITEMAPS_HEADERS), "sitemapIndex")
         date_downloaded = date.today()
+        # a domain has a row per sitemap and content type, the key must cover all of them or rows are lost on import
+        primary_key = None
+        if self.batch_mode:
+            primary_key = ["domain", "path", "content_type"] + (["sitemapIndex"] if expand_indexes else [])
         out_table = self.create_out_table_definition(name=self.out_table_name,
-                                                     columns=fieldnames)
-        self.write_results_to_out_table(out_table.full_path, fieldnames, data, date_downloaded)
-        self.write_tabledef_manifest(out_table)
-
-    def write_results_to_out_table(self, file_path: str, fieldnames: List[str], data: List[Dict],
-                                   date_downloaded: date) -> None:
-        with open(file_path, mode='wt', encoding='utf-8', newline='') as out_file:
-            writer = csv.DictWriter(out_file, fieldnames)
-            for result in data:
-                result["date_downloaded"] = date_downloaded
-                result["domain"] = self.domain
-                writer.writerow(result)
-
-    def get_search_analytics_data(self, gsc_client: GoogleSearchConsoleClient) -> Generator:
+                                                     columns=fieldnames,
+                                                     primary_key=primary_key,
+                                                     is_sliced=True)
+        self.create_sliced_directory(out_table.full_path)
+        get_values = itemgetter(*fieldnames[:-2])
+
+        def fetch_and_write_domain(domain_index: int, domain: str) -> None:
+            data = self.get_sitemaps_data(gsc_client, domain, expand_indexes)
+            if data:
+                rows = (list(get_values(row)) for row in data)
+                slice_path = path.join(out_table.full_path, str(domain_index))
+                with gsc_client.metrics.measure("write_results_to_out_table", domain) as measurement:
+                    self.write_results_to_out_table(slice_path, rows, date_downloaded, domain)
+                    measurement.rows = len(data)
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(domains))) as executor:
+            self.wait_for_futures([executor.submit(fetch_and_write_domain, domain_index, domain)
+                                   for domain_index, domain in enumerate(domains)])
+        if len(listdir(out_table.full_path)) != 0:
+            self.write_tabledef_manifest(out_table)
+        else:
+            logging.warning("No Data Found")
+            rmdir(out_table.full_path)
+
+    def fetch_and_write_url_inspection_data(self, gsc_client: GoogleSearchConsoleClient, domains: List[str]) -> None:
         params = self.configuration.parameters
-        search_analytics_dimensions = self.parse_list_from_string(params.get(KEY_SEARCH_ANALYTICS_DIMENSIONS, ""))
-        search_type = params.get(KEY_SEARCH_TYPE)
-        if search_type and search_type not in SEARCH_TYPES:
-            raise UserException(f"Type must be one of the following {SEARCH_TYPES}, you entered '{search_type}'.")
-        if not search_analytics_dimensions:
-            raise UserException("Missing Search Analytics dimensions, please fill them in")
+        settings = params.get(KEY_URL_INSPECTION, {})
+        max_urls = settings.get(KEY_URL_INSPECTION_MAX_URLS, URL_INSPECTION_SITE_QPD)
+        cache_days = settings.get(KEY_URL_INSPECTION_CACHE_DAYS, 0)
+        language_code = settings.get(KEY_URL_INSPECTION_LANGUAGE_CODE)
+        self.validate_url_inspection_options(max_urls, cache_days)
+        date_downloaded = date.today()
+        out_table = self.create_out_table_definition(name=self.out_table_name,
+                                                     columns=URL_INSPECTION_HEADERS + ["date_downloaded", "domain"],
+                                                     primary_key=["inspection_url", "domain"],
+                                                     incremental=self.incremental,
+                                                     is_sliced=True)
+        self.create_sliced_directory(out_table.full_path)
 
-        date_from, date_to = self.get_date_range(params.get(KEY_DATE_FROM),
-                                                 params.get(KEY_DATE_TO),
+        # dates of past inspections by domain and URL, used to skip recently inspected URLs and to count the daily quota
+        inspections = self.state.setdefault(STATE_URL_INSPECTIONS, {})
+        inspections_lock = threading.Lock()
+        configured_urls = self.get_configured_inspection_urls(settings.get(KEY_URL_INSPECTION_URLS, []), domains)
+        tasks = []
+        for domain_index, domain in enumerate(domains):
+            domain_inspections = inspections.setdefault(domain, {})
+            for url, inspected in list(domain_inspections.items()):
+                if (date_downloaded - date.fromisoformat(inspected)).days >= max(cache_days, 1):
+                    del domain_inspections[url]
+            if configured_urls:
+                urls = configured_urls[domain]
+            else:
+                try:
+                    urls = self.get_search_analytics_pages(gsc_client, domain, max_urls)
+                except (ClientError, HttpError) as cl_error:
+                    raise UserException(cl_error) from cl_error
+            urls = [url for url in dict.fromkeys(urls) if not cache_days or url not in domain_inspections]
+            quota_left = URL_INSPECTION_SITE_QPD - sum(inspected == str(date_downloaded)
+                                                       for inspected in domain_inspections.values())
+            url_limit = max(min(max_urls, quota_left), 0)
+            if len(urls) > url_limit:
+                logging.warning(f"Inspecting {url_limit} of {len(urls)} URLs of {domain} due to the URL limit or "
+                                f"the daily URL inspection quota")
+            urls = urls[:url_limit]
+            logging.info(f"Inspecting {len(urls)} URLs of {domain}")
+            for chunk_start in range(0, len(urls), URL_INSPECTION_SLICE_SIZE):
+                tasks.append((f"{domain_index}_{chunk_start // URL_INSPECTION_SLICE_SIZE}", domain,
+                              urls[chunk_start:chunk_start + URL_INSPECTION_SLICE_SIZE]))
+
+        def inspect_and_write(slice_name: str, domain: str, urls: List[str]) -> None:
+            rows = []
+            for url in urls:
+                result = gsc_client.inspect_url(domain, url, language_code)
+                if result is not None:
+                    rows.append(self.parse_url_inspection_result(url, result))
+            if rows:
+                with gsc_client.metrics.measure("write_results_to_out_table", domain) as measurement:
+                    self.write_results_to_out_table(path.join(out_table.full_path, slice_name), rows,
+                                                    date_downloaded, domain)
+                    measurement.rows = len(rows)
+            with inspections_lock:
+                inspections[domain].update((row[0], str(date_downloaded)) for row in rows)
+
+        try:
+            if tasks:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                    self.wait_for_futures([executor.submit(inspect_and_write, *task) for task in tasks])
+        except (ClientError, HttpError, ClientAuthError) as cl_error:
+            raise UserException(cl_error) from cl_error
+        if len(listdir(out_table.full_path)) != 0:
+            self.write_tabledef_manifest(out_table)
+        else:
+            logging.warning("No Data Found")
+            rmdir(out_table.full_path)
+
+    @staticmethod
+    def get_configured_inspection_urls(urls: List[str], domains: List[str]) -> Dict[str, List[str]]:
+        """Assigns the configured URLs to the domains whose host they belong to."""
+        if not urls:
+            return {}
+        if len(domains) == 1:
+            return {domains[0]: urls}
+        hosts = {domain: urlparse(domain if "://" in domain else f"//{domain.replace('sc-domain:', '')}").hostname
+                 for domain in domains}
+        domain_urls = {domain: [] for domain in domains}
+        for url in urls:
+            host = urlparse(url).hostname or ""
+            domain = next((domain for domain, domain_host in hosts.items()
+                           if host == domain_host or host.endswith(f".{domain_host}")), None)
+            if domain is None:
+                logging.warning(f"{url} does not belong to any of the configured domains, skipping it")
+            else:
+                domain_urls[domain].append(url)
+        return domain_urls
+
+    def get_search_analytics_pages(self, gsc_client: GoogleSearchConsoleClient, domain: str,
+                                   max_urls: int) -> List[str]:
+        """Returns the pages with the most clicks in the configured date range."""
+        params = self.configuration.parameters
+        date_from, date_to = self.get_date_range(params.get(KEY_DATE_FROM), params.get(KEY_DATE_TO),
                                                  params.get(KEY_DATE_RANGE))
+        query = SearchAnalyticsQuery("pages", domain, date_from, date_to)
+        pages = []
+        paged_data = self.get_search_analytics_data(gsc_client, query, ["page"], params.get(KEY_SEARCH_TYPE))
+        try:
+            for page in paged_data:
+                pages.extend(row["keys"][0] for row in page)
+                if len(pages) >= max_urls:
+                    break
+        finally:
+            paged_data.close()
+        return pages[:max_urls]
 
-        logging.info(
-            f"Fetching data for search analytics for {search_analytics_dimensions} dimensions for domain {self.domain},"
-            f"for dates from {date_from} to {date_to}")
+    @staticmethod
+    def parse_url_inspection_result(inspection_url: str, result: Dict) -> List:
+        """Flattens an inspection result into a row laid out as URL_INSPECTION_HEADERS."""
+        index_status = result.get("indexStatusResult", {})
+        mobile_usability = result.get("mobileUsabilityResult", {})
+        rich_results = result.get("richResultsResult", {})
+        return [inspection_url,
+                index_status.get("verdict"),
+                index_status.get("coverageState"),
+                index_status.get("indexingState"),
+                index_status.get("robotsTxtState"),
+                index_status.get("pageFetchState"),
+                index_status.get("lastCrawlTime"),
+                index_status.get("crawledAs"),
+                index_status.get("googleCanonical"),
+                index_status.get("userCanonical"),
+                ",".join(index_status.get("sitemap", [])),
+                ",".join(index_status.get("referringUrls", [])),
+                mobile_usability.get("verdict"),
+                ",".join(issue.get("issueType", "") for issue in mobile_usability.get("issues", [])),
+                rich_results.get("verdict"),
+                ",".join(item.get("richResultType", "") for item in rich_results.get("detectedItems", [])),
+                result.get("ampResult", {}).get("verdict"),
+                result.get("inspectionResultLink")]
 
-        logging.info(f"Filters set as {self.filter_groups}")
+    @staticmethod
+    def get_run_metrics_summary(metrics: RunMetrics) -> str:
+        api_requests = [metrics.get_totals(metric) for metric in metrics.get_metric_names(API_METRICS_PREFIXES)]
+        request_count = sum(stats.count for stats in api_requests)
+        request_rows = sum(stats.rows for stats in api_requests)
+        quota_errors = {metric.split(".", 1)[1]: metrics.get_totals(metric).count
+                        for metric in metrics.get_metric_names("quota_error.")}
+        parsing = metrics.get_totals("parse_search_analytics_data")
+        writing = metrics.get_totals("write_results_to_out_table")
+        rows_per_second = writing.rows / writing.seconds if writing.seconds else 0
+        return (f"Run metrics: {request_count} API requests ({sum(stats.errors for stats in api_requests)} failed) "
+                f"taking {sum(stats.seconds for stats in api_requests):.1f} s, "
+                f"max {max([stats.max_seconds for stats in api_requests], default=0):.2f} s, "
+                f"{sum(stats.bytes for stats in api_requests) / 2 ** 20:.1f} MB received, "
+                f"{request_rows / request_count if request_count else 0:.0f} rows per request; "
+                f"quota errors {quota_errors or 'none'}, "
+                f"{metrics.get_totals('retry_backoff').seconds:.1f} s retry backoff, "
+                f"{metrics.get_totals('rate_limiter_wait').seconds:.1f} s rate limiter wait; "
+                f"parsing {parsing.rows} rows took {parsing.seconds:.1f} s; "
+                f"writing {writing.rows} rows took {writing.seconds:.1f} s ({rows_per_second:.0f} rows/s)")
 
-        if not self.filter_groups:
-            return self._get_search_analytics_data(gsc_client, date_from, date_to, search_analytics_dimensions,
-                                                   search_type)
+    def write_run_metrics(self, metrics: RunMetrics) -> None:
+        """Appends the metrics of this run to the run metrics table, durations are summed over threads."""
+        run_id = self.environment_variables.run_id or datetime.utcnow().isoformat(timespec="seconds")
+        table = self.create_out_table_definition(f"{self.out_table_name[:-len('.csv')]}_run_metrics.csv",
+                                                 columns=["run_id"] + METRICS_COLUMNS,
+                                                 primary_key=["run_id", "metric", "domain"],
+                                                 incremental=True)
+        CsvSliceWriter().write(table.full_path, ([run_id] + row for row in metrics.get_rows()))
+        self.write_tabledef_manifest(table)
 
-        for filter_group in self.filter_groups:
-            return self._get_search_analytics_data(gsc_client, date_from, date_to, search_analytics_dimensions,
-                                                   search_type, filter_group=filter_group)
+    @staticmethod
+    def write_results_to_out_table(file_path: str, rows: Iterable[List], date_downloaded: date, domain: str,
+                                   slice_writer: Optional[SliceWriter] = None) -> None:
+        """Writes rows positionally aligned with the table columns, date_downloaded and domain are appended."""
+        extra_values = [date_downloaded, domain]
+        slice_writer = slice_writer or CsvSliceWriter()
+        slice_writer.write(file_path, (row + extra_values for row in rows))
+
+    @staticmethod
+    def write_columns_to_out_table(file_path: str, columns: List[Sequence], date_downloaded: date, domain: str,
+                                   slice_writer: SliceWriter) -> None:
+        """Writes columns laid out as the table columns, date_downloaded and domain columns are appended."""
+        row_count = len(columns[-1])
+        slice_writer.write_columns(file_path, columns + [[date_downloaded] * row_count, [domain] * row_count])
 
-    def _get_search_analytics_data(self, gsc_client: GoogleSearchConsoleClient, date_from: date, date_to: date,
-                                   search_analytics_dimensions: List[str], search_type: str,
-                                   filter_group=None) -> Generator:
+    def get_search_analytics_data(self, gsc_client: GoogleSearchConsoleClient, query: SearchAnalyticsQuery,
+                                  search_analytics_dimensions: List[str], search_type: str) -> Generator:
+        logging.info(
+            f"Fetching data for search analytics for {search_analytics_dimensions} dimensions for domain "
+            f"{query.domain}, for dates from {query.date_from} to {query.date_to}")
         include_fresh = self.configuration.parameters.get(KEY_INCLUDE_FRESH, False)
-        if filter_group is None:
-            filter_group = []
+        filters = list(query.filter_group) + [{"dimension": dimension, "operator": "equals", "expression": value}
+                                              for dimension, value in query.partition_filters]
         try:
-            paged_data = gsc_client.get_search_analytics_data(date_from, date_to, self.domain,
+            paged_data = gsc_client.get_search_analytics_data(query.date_from, query.date_to, query.domain,
                                                               search_analytics_dimensions, search_type,
-                                                              filter_group, include_fresh)
+                                                              [filters] if filters else [], include_fresh,
+                                                              prefetch_pages=self.prefetch_pages,
+                                                              start_row=query.start_row)
             return paged_data
         except ClientError as client_error:
-            raise UserException(client_error.args[0].error_details[0]["message"]) from client_error
+            raise UserException(self.get_client_error_message(client_error)) from client_error
 
     @staticmethod
-    def filter_duplicates_from_data(data: List[Dict]) -> List[Dict]:
-        seen = set()
-        new_data = []
-        for datum in data:
-            t = tuple(sorted(datum.items()))
-            if t not in seen:
-                seen.add(t)
-                new_data.append(datum)
-        return new_data
+    def validate_search_analytics_parameters(search_analytics_dimensions: List[str], search_type: str) -> None:
+        if search_type and search_type not in SEARCH_TYPES:
+            raise UserException(f"Type must be one of the following {SEARCH_TYPES}, you entered '{search_type}'.")
+        if not search_analytics_dimensions:
+            raise UserException("Missing Search Analytics dimensions, please fill them in")
 
     @staticmethod
     def parse_list_from_string(string_list: str) -> List[str]:
@@ -219,35 +1064,54 @@ class Component(ComponentBase):
         else:
             return [string_list]
 
-    def parse_search_analytics_data(self, data: List[Dict], dimensions: List[str]) -> List[Dict]:
-        parsed_data = []
-        for row in data:
-            parsed_data.append(self._parse_search_analytics_row(row, dimensions))
-        return parsed_data
-
     @staticmethod
-    def _parse_search_analytics_row(row: Dict, dimensions: List[str]) -> Dict:
-        parsed_row = {}
-        for i, dimension in enumerate(dimensions):
-            parsed_row[dimension] = row["keys"][i]
-        data_headers = list(row.keys())
-        data_headers.remove("keys")
-        for key in data_headers:
-            parsed_row[key] = row[key]
-        return parsed_row
-
-    def get_sitemaps_data(self, gsc_client: GoogleSearchConsoleClient) -> List[Dict]:
-        logging.info("Fetching sitemaps data")
-        data = self._get_sitemaps_data(gsc_client)
+    def parse_search_analytics_page(data: List[Dict], dimension_count: int,
+                                    recompute_ctr: bool = False) -> List[Sequence]:
+        """
+        Returns the rows of a page as columns laid out as the dimension keys followed by SEARCH_ANALYTICS_METRICS.
+        Clicks and impressions are integers, ctr and position floats. With recompute_ctr, ctr is recomputed as clicks
+        per impression.
+        """
+        dimension_columns = list(zip(*[row["keys"] for row in data])) or [()] * dimension_count
+        clicks = [int(row["clicks"]) for row in data]
+        impressions = [int(row["impressions"]) for row in data]
+        if recompute_ctr:
+            ctr = [row_clicks / row_impressions if row_impressions else 0.0
+                   for row_clicks, row_impressions in zip(clicks, impressions)]
+        else:
+            ctr = [float(row["ctr"]) for row in data]
+        position = [float(row["position"]) for row in data]
+        return [*dimension_columns, clicks, impressions, ctr, position]
+
+    def get_sitemaps_data(self, gsc_client: GoogleSearchConsoleClient, domain: str,
+                          expand_indexes: bool = False) -> List[Dict]:
+        logging.info(f"Fetching sitemaps data for domain {domain}")
+        with gsc_client.metrics.measure("get_sitemaps_data", domain):
+            data = self._get_sitemaps_data(gsc_client, domain, expand_indexes, self.max_workers)
         logging.info("Parsing results")
-        data = self.parse_sitemaps_data(data)
+        with gsc_client.metrics.measure("parse_sitemaps_data", domain) as measurement:
+            data = self.parse_sitemaps_data(data)
+            measurement.rows = len(data)
         return data
 
-    def _get_sitemaps_data(self, gsc_client: GoogleSearchConsoleClient) -> List[Dict]:
+    @staticmethod
+    def get_client_error_message(client_error: ClientError) -> str:
+        """The API message of a wrapped HttpError, client errors raised with a message are returned as they are."""
+        http_error = client_error.args[0] if client_error.args else None
+        if isinstance(http_error, HttpError):
+            try:
+                return http_error.error_details[0]["message"]
+            except (TypeError, IndexError, KeyError):
+                pass
+        return str(client_error)
+
+    @classmethod
+    def _get_sitemaps_data(cls, gsc_client: GoogleSearchConsoleClient, domain: str, expand_indexes: bool = False,
+                           max_workers: int = 1) -> List[Dict]:
         try:
-            return gsc_client.get_sitemaps_data(self.domain)
+            return gsc_client.get_sitemaps_data(domain, expand_indexes, max_workers)
         except ClientError as client_error:
-            raise UserException(client_error.args[0].error_details[0]["message"]) from client_error
+            raise UserException(cls.get_client_error_message(client_error)) from client_error
         except ClientAuthError as client_auth_error:
             raise UserException(client_auth_error)
 
@@ -270,6 +1134,7 @@ class Component(ComponentBase):
             parsed_row = {}
             for sitemap_header in SITEMAPS_HEADERS:
                 parsed_row[sitemap_header] = row.get(sitemap_header)
+            parsed_row["sitemapIndex"] = row.get("sitemapIndex", "")
             parsed_row["content_type"] = content["type"]
             parsed_row["submitted"] = content["submitted"]
             parsed_row["indexed"] = content["indexed"]
@@ -282,6 +1147,7 @@ class Component(ComponentBase):
         parsed_row = {}
         for sitemap_header in SITEMAPS_HEADERS:
             parsed_row[sitemap_header] = row.get(sitemap_header)
+        parsed_row["sitemapIndex"] = row.get("sitemapIndex", "")
         parsed_row["content_type"] = ""
         parsed_row["submitted"] = ""
         parsed_row["indexed"] = ""
@@ -294,15 +1160,26 @@ class Component(ComponentBase):
         elif date_range == "Last month":
             start_date, end_date = self.get_last_month_dates()
         elif date_range == "Custom":
-            try:
-                start_date = dateparser.parse(date_from).date()
-                end_date = dateparser.parse(date_to).date()
-            except AttributeError:
-                raise UserException("Date input is invalid, please recheck the documentation on valid inputs")
+            start_date = self.parse_date(date_from)
+            end_date = self.parse_date(date_to)
         else:
             raise UserException(f"Date range type : {date_range} is invalid")
         return start_date, end_date
 
+    @staticmethod
+    def parse_date(date_string: str) -> date:
+        """Parses ISO dates directly, relative dates like '3 days ago' are parsed by dateparser."""
+        try:
+            return date.fromisoformat(date_string)
+        except (TypeError, ValueError):
+            pass
+        # dateparser takes a long time to import, it is only loaded for relative dates
+        import dateparser
+        try:
+            return dateparser.parse(date_string).date()
+        except (AttributeError, TypeError):
+            raise UserException("Date input is invalid, please recheck the documentation on valid inputs")
+
     @staticmethod
     def get_last_week_dates() -> Tuple[date, date]:
         today = date.today()
@@ -323,6 +1200,47 @@ class Component(ComponentBase):
             raise UserException(
                 "Output Table name is not valid, make sure it only contains alphanumeric characters and underscores")
 
+    @staticmethod
+    def validate_domains(domain: str, domains: List[str], all_verified_sites: bool) -> None:
+        if not domain and not domains and not all_verified_sites:
+            raise UserException("Missing domain, fill in the domain, a list of domains or select all verified sites")
+        if not isinstance(domains, list) or not all(isinstance(d, str) and d for d in domains):
+            raise UserException("Domains must be a list of domain names")
+
+    @staticmethod
+    def validate_loading_options(incremental: int, incremental_fetching: bool, refetch_window_days: int,
+                                 output_format: str) -> None:
+        if incremental_fetching and not incremental:
+            raise UserException("Incremental fetching requires the Incremental Update load type, otherwise the "
+                                "output table would be overwritten by the newly fetched days only")
+        if not isinstance(refetch_window_days, int) or refetch_window_days < 0:
+            raise UserException("Re-fetch window days must be a non-negative integer")
+        if output_format not in OUTPUT_FORMATS:
+            raise UserException(f"Output format must be one of the following {OUTPUT_FORMATS}, "
+                                f"you entered '{output_format}'.")
+
+    @staticmethod
+    def validate_url_inspection_options(max_urls: int, cache_days: int) -> None:
+        if not isinstance(max_urls, int) or max_urls < 1:
+            raise UserException("Max URLs must be a positive integer")
+        if not isinstance(cache_days, int) or cache_days < 0:
+            raise UserException("Cache days must be a non-negative integer, use 0 to inspect all URLs every run")
+
+    @staticmethod
+    def validate_extraction_options(date_shard_days: int, max_workers: int, prefetch_pages: int,
+                                    partition_row_threshold: int, deduplication_spill_threshold: int) -> None:
+        if not isinstance(date_shard_days, int) or date_shard_days < 0:
+            raise UserException("Date shard days must be a non-negative integer, use 0 to disable date sharding")
+        if not isinstance(max_workers, int) or max_workers < 1:
+            raise UserException("Max workers must be a positive integer")
+        if not isinstance(prefetch_pages, int) or prefetch_pages < 0:
+            raise UserException("Prefetched pages must be a non-negative integer, use 0 to disable prefetching")
+        if not isinstance(partition_row_threshold, int) or partition_row_threshold < 1:
+            raise UserException("Partition row threshold must be a positive integer")
+        if not isinstance(deduplication_spill_threshold, int) or deduplication_spill_threshold < 0:
+            raise UserException("De-duplication spill threshold must be a non-negative integer, use 0 to keep all "
+                                "de-duplication keys in memory")
+
 
 if __name__ == "__main__":
     try:
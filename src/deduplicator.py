@@ -0,0 +1,96 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from typing import Dict, List, Tuple, Iterable, Optional
+
+DIGEST_SIZE = 16
+KEY_SEPARATOR = "\x1f"
+
+
+class RowDeduplicator:
+    """
+    Thread safe de-duplicator of search analytics rows keyed on the domain and the dimension values.
+
+    Only a 16 byte digest of every key is remembered. Once more than spill_threshold keys are seen, the digests are
+    moved to an on-disk SQLite table, so memory stays bounded for very large outputs.
+    """
+
+    def __init__(self, spill_threshold: int = 0, spill_directory: Optional[str] = None) -> None:
+        self.spill_threshold = spill_threshold
+        self.spill_directory = spill_directory
+        self._digests = set()
+        self._connection: Optional[sqlite3.Connection] = None
+        self._db_path = ""
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def get_digest(domain: str, keys: List[str]) -> bytes:
+        key = KEY_SEPARATOR.join([domain, *keys]).encode("utf-8")
+        return hashlib.blake2b(key, digest_size=DIGEST_SIZE).digest()
+
+    def filter_new(self, domain: str, rows: Iterable[Dict]) -> Tuple[List[Dict], List[bytes]]:
+        """Returns the rows whose keys were not seen yet along with the digests registered for them."""
+        get_digest = self.get_digest
+        keyed_rows = [(get_digest(domain, row["keys"]), row) for row in rows]
+        with self._lock:
+            if self._connection is None:
+                new_rows, new_digests = self._filter_in_memory(keyed_rows)
+                if self.spill_threshold and len(self._digests) > self.spill_threshold:
+                    self._spill()
+            else:
+                new_rows, new_digests = self._filter_on_disk(keyed_rows)
+        return new_rows, new_digests
+
+    def forget(self, digests: List[bytes]) -> None:
+        """Removes keys of rows that were discarded, so the rows are accepted again."""
+        with self._lock:
+            if self._connection is None:
+                self._digests.difference_update(digests)
+            else:
+                self._connection.executemany("DELETE FROM seen WHERE digest = ?", ((d,) for d in digests))
+                self._connection.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._digests = set()
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+                os.remove(self._db_path)
+
+    def _filter_in_memory(self, keyed_rows: List[Tuple[bytes, Dict]]) -> Tuple[List[Dict], List[bytes]]:
+        new_rows = []
+        new_digests = []
+        for digest, row in keyed_rows:
+            if digest not in self._digests:
+                self._digests.add(digest)
+                new_rows.append(row)
+                new_digests.append(digest)
+        return new_rows, new_digests
+
+    def _filter_on_disk(self, keyed_rows: List[Tuple[bytes, Dict]]) -> Tuple[List[Dict], List[bytes]]:
+        new_rows = []
+        new_digests = []
+        cursor = self._connection.cursor()
+        for digest, row in keyed_rows:
+            cursor.execute("INSERT OR IGNORE INTO seen (digest) VALUES (?)", (digest,))
+            if cursor.rowcount:
+                new_rows.append(row)
+                new_digests.append(digest)
+        self._connection.commit()
+        return new_rows, new_digests
+
+    def _spill(self) -> None:
+        logging.info(f"De-duplication keys exceeded {self.spill_threshold}, moving them to disk")
+        file_descriptor, self._db_path = tempfile.mkstemp(suffix=".sqlite", dir=self.spill_directory)
+        os.close(file_descriptor)
+        self._connection = sqlite3.connect(self._db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = OFF")
+        self._connection.execute("PRAGMA synchronous = OFF")
+        self._connection.execute("CREATE TABLE seen (digest BLOB PRIMARY KEY) WITHOUT ROWID")
+        self._connection.executemany("INSERT INTO seen (digest) VALUES (?)", ((d,) for d in self._digests))
+        self._connection.commit()
+        self._digests = set()
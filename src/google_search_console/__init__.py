@@ -1 +1 @@
-from .client import GoogleSearchConsoleClient, ClientError, ClientAuthError  # noqa
+from .client import GoogleSearchConsoleClient, ClientError, ClientAuthError, ClientTimeoutError, split_date_range  # noqa
@@ -1,15 +1,27 @@
+import json
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
+import google_auth_httplib2
+import httplib2
 from google.oauth2.credentials import Credentials
 from google.oauth2.service_account import Credentials as ServiceAccountCredentials
-from retry import retry
 from google.auth.transport import requests
 from googleapiclient.errors import HttpError
 from googleapiclient import discovery
+from googleapiclient.discovery_cache import get_static_doc
 from google.auth.exceptions import RefreshError
-from .exception import ClientError, RetryableException, ClientAuthError
-from typing import Dict, List, Generator
-from datetime import date
+from .exception import ClientError, ClientAuthError, ClientTimeoutError
+from .metrics import RunMetrics, MeteredHttp
+from .response_cache import ResponseCache
+from .rate_limiter import RateLimiter, SEARCH_ANALYTICS_USER_QPM, SEARCH_ANALYTICS_SITE_QPM, DEFAULT_USER_QPM, \
+    URL_INSPECTION_USER_QPM, URL_INSPECTION_SITE_QPM
+from typing import Dict, List, Generator, Tuple, Iterator, Optional
+from functools import lru_cache
+from datetime import date, datetime, timedelta
 import socket
 
 API_ROW_LIMIT = 25000
@@ -17,44 +29,215 @@ RETRYABLE_ERROR_CODES = ["concurrentLimitExceeded", "dailyLimitExceeded", "daily
                          "quotaExceeded", "rateLimitExceeded", "rateLimitExceededUnreg", "userRateLimitExceeded",
                          "userRateLimitExceededUnreg", "variableTermExpiredDailyExceeded", "variableTermLimitExceeded",
                          "dailyLimitExceeded402", "quotaExceeded402", "servingLimitExceeded"]
+MAX_RETRIES = 5
+# seconds to wait for a response, slower requests fail with a timeout
+DEFAULT_REQUEST_TIMEOUT = 120
+# order in which property URL variants of a bare domain are tried
+PROPERTY_URL_PREFIXES = ["", "sc-domain:", "https://www.", "http://www.", "https://", "http://"]
+
+
+def prefetch(pages: Iterator, depth: int) -> Generator:
+    """Fetches up to depth pages ahead of the consumer in a background thread."""
+    page_queue = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item: Tuple) -> bool:
+        while not stopped.is_set():
+            try:
+                page_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put((True, page)):
+                    return
+        except Exception as error:
+            put((False, error))
+            return
+        put((False, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            is_page, value = page_queue.get()
+            if is_page:
+                yield value
+            elif value is not None:
+                raise value
+            else:
+                return
+    finally:
+        stopped.set()
+
+
+@lru_cache(maxsize=1)
+def get_discovery_document() -> Dict:
+    """Returns the parsed discovery document shipped with the pinned googleapiclient version, no request is made."""
+    return json.loads(get_static_doc("searchconsole", "v1"))
+
+
+def split_date_range(start_date: date, end_date: date, shard_days: int) -> List[Tuple[date, date]]:
+    shards = []
+    shard_start = start_date
+    while shard_start <= end_date:
+        shard_end = min(shard_start + timedelta(days=shard_days - 1), end_date)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return shards
 
 
 class GoogleSearchConsoleClient:
-    def __init__(self, credentials: Credentials, **kwargs) -> None:
-        self.service = discovery.build('searchconsole', 'v1', credentials=credentials, cache_discovery=False)
+    def __init__(self, credentials: Credentials, http=None, request_timeout: float = DEFAULT_REQUEST_TIMEOUT,
+                 response_cache: Optional[ResponseCache] = None, **kwargs) -> None:
+        """
+        http replaces the authorized transport of all requests, e.g. to run against an offline API simulator.
+        response_cache serves repeated search analytics requests of finalized date ranges without calling the API.
+        """
+        self.credentials = credentials
+        self._http = http
+        self.request_timeout = request_timeout
+        self.response_cache = response_cache
+        if http is None:
+            self.service = discovery.build_from_document(get_discovery_document(), credentials=credentials)
+        else:
+            self.service = discovery.build_from_document(get_discovery_document(), http=http)
+        # httplib2 transports are not thread safe, a request checks out a transport from the pool for exclusive use,
+        # the transports keep their connections alive so subsequent requests skip the TLS handshake
+        self._idle_http = queue.LifoQueue()
+        self._resolved_properties: Dict[str, str] = {}
+        self._unverified_properties = set()
+        self._site_entries = None
+        # one scheduler per API quota group, shared by all threads using the client
+        self.search_analytics_rate_limiter = RateLimiter(SEARCH_ANALYTICS_USER_QPM, SEARCH_ANALYTICS_SITE_QPM)
+        self.default_rate_limiter = RateLimiter(DEFAULT_USER_QPM)
+        self.url_inspection_rate_limiter = RateLimiter(URL_INSPECTION_USER_QPM, URL_INSPECTION_SITE_QPM)
+        self._resolve_lock = threading.Lock()
+        self.metrics = RunMetrics()
+
+    def _acquire_http(self) -> MeteredHttp:
+        try:
+            return self._idle_http.get_nowait()
+        except queue.Empty:
+            http = self._http
+            if http is None:
+                http = google_auth_httplib2.AuthorizedHttp(self.credentials,
+                                                           http=httplib2.Http(timeout=self.request_timeout))
+            return MeteredHttp(http)
+
+    def _release_http(self, http: MeteredHttp) -> None:
+        self._idle_http.put(http)
 
     @classmethod
-    def from_auth_code(cls, client_id, client_secret, refresh_token, token_uri="https://oauth2.googleapis.com/token"):
-        credentials = Credentials(None, client_id=client_id,
+    def from_auth_code(cls, client_id, client_secret, refresh_token, token_uri="https://oauth2.googleapis.com/token",
+                       access_token: Optional[str] = None, expiry: Optional[datetime] = None, **kwargs):
+        """A cached access_token is used until its expiry, otherwise a new one is requested."""
+        credentials = Credentials(access_token, client_id=client_id,
                                   client_secret=client_secret,
                                   refresh_token=refresh_token,
-                                  token_uri=token_uri)
-        request = requests.Request()
-        try:
-            credentials.refresh(request)
-        except RefreshError:
-            raise ClientError("Invalid credentials, please re-authenticate the application")
+                                  token_uri=token_uri,
+                                  expiry=expiry)
+        if not credentials.valid:
+            request = requests.Request()
+            try:
+                credentials.refresh(request)
+            except RefreshError:
+                raise ClientError("Invalid credentials, please re-authenticate the application")
 
-        return cls(credentials)
+        return cls(credentials, **kwargs)
 
     @classmethod
-    def from_service_account(cls, service_account_info):
+    def from_service_account(cls, service_account_info, access_token: Optional[str] = None,
+                             expiry: Optional[datetime] = None, **kwargs):
         credentials = ServiceAccountCredentials.from_service_account_info(service_account_info)
         credentials = credentials.with_scopes(['https://www.googleapis.com/auth/webmasters.readonly'])
+        # the token is requested lazily with the first request unless the cached one is still valid
+        credentials.token = access_token
+        credentials.expiry = expiry
 
-        return cls(credentials)
+        return cls(credentials, **kwargs)
 
-    def get_verified_sites(self):
-        site_list = self.service.sites().list().execute()
+    @property
+    def access_token(self) -> Tuple[Optional[str], Optional[datetime]]:
+        """Returns the current access token and its expiry (naive UTC), so it can be reused by the next run."""
+        return self.credentials.token, self.credentials.expiry
 
-        verified_sites_urls = [s['siteUrl'] for s in site_list['siteEntry']
+    def get_verified_sites(self):
+        verified_sites_urls = [s['siteUrl'] for s in self.list_sites()
                                if s['permissionLevel'] != 'siteUnverifiedUser'
-                               and s['siteUrl'][:4] == 'http']
+                               and s['siteUrl'].startswith(('http', 'sc-domain:'))]
         return verified_sites_urls
 
+    def list_sites(self) -> List[Dict]:
+        if self._site_entries is None:
+            site_list = self._execute_request(self.service.sites().list(), self.default_rate_limiter)
+            self._site_entries = site_list.get('siteEntry', [])
+        return self._site_entries
+
+    @property
+    def resolved_properties(self) -> Dict[str, str]:
+        with self._resolve_lock:
+            return dict(self._resolved_properties)
+
+    def set_resolved_property(self, url: str, site_url: str) -> None:
+        """Seeds the resolver with a previously resolved site URL, it is re-resolved if access is denied."""
+        with self._resolve_lock:
+            self._resolved_properties[url] = site_url
+            self._unverified_properties.add(url)
+
+    def resolve_property(self, url: str, refresh: bool = False) -> str:
+        with self._resolve_lock:
+            if refresh or url not in self._resolved_properties:
+                if refresh:
+                    self._site_entries = None
+                self._resolved_properties[url] = self._resolve_property(url)
+                self._unverified_properties.discard(url)
+            return self._resolved_properties[url]
+
+    def _resolve_property(self, url: str) -> str:
+        if url.startswith(("sc-domain:", "http://", "https://")):
+            candidates = [url]
+        else:
+            candidates = ["".join([prefix, url]) for prefix in PROPERTY_URL_PREFIXES]
+
+        try:
+            site_urls = [s['siteUrl'] for s in self.list_sites() if s['permissionLevel'] != 'siteUnverifiedUser']
+        except HttpError as http_error:
+            logging.warning(f"Could not list Search Console sites, probing the property URL variants: {http_error}")
+            site_urls = []
+        for candidate in candidates:
+            for site_url in [candidate, "".join([candidate, "/"])]:
+                if site_url in site_urls:
+                    logging.info(f"Resolved {url} to Search Console property {site_url}")
+                    return site_url
+
+        for candidate in candidates:
+            # URL-prefix properties are always registered with a trailing slash
+            if candidate.startswith(("http://", "https://")) and not candidate.endswith("/"):
+                candidate = "".join([candidate, "/"])
+            if self._probe_property(candidate):
+                logging.info(f"Resolved {url} to Search Console property {candidate}")
+                return candidate
+
+        raise ClientAuthError(f"{url} is not a valid Search Console site URL. Check the error log and make sure "
+                              f"you have sufficient rights and if the url is valid.")
+
+    def _probe_property(self, site_url: str) -> bool:
+        try:
+            site = self._execute_request(self.service.sites().get(siteUrl=site_url), self.default_rate_limiter)
+            return site.get('permissionLevel') != 'siteUnverifiedUser'
+        except HttpError as http_error:
+            if http_error.status_code in [400, 403, 404]:
+                return False
+            self._process_exception(http_error)
+
     def get_search_analytics_data(self, start_date: date, end_date: date, url: str, dimensions: List[str],
                                   search_type: str = None, filter_groups: List[Dict] = None,
-                                  include_fresh: bool = False) -> Generator:
+                                  include_fresh: bool = False, prefetch_pages: int = 0,
+                                  start_row: int = 0, row_limit: int = API_ROW_LIMIT) -> Generator:
         request: Dict = {
             'startDate': str(start_date),
             'endDate': str(end_date),
@@ -68,11 +251,18 @@ class GoogleSearchConsoleClient:
             request["type"] = search_type
         for filters in filter_groups:
             request["dimensionFilterGroups"].append({"groupType": "and", "filters": filters})
-        return self.get_result_pages(request, url)
+        return self.get_result_pages(request, url, prefetch_pages, start_row, row_limit)
+
+    def get_result_pages(self, request: Dict, url: str, prefetch_pages: int = 0, start_row: int = 0,
+                         row_limit: int = API_ROW_LIMIT) -> Generator:
+        """Yields result pages of row_limit rows, start_row allows resuming at a page boundary."""
+        pages = self._get_result_pages(request, url, start_row, row_limit)
+        if prefetch_pages:
+            return prefetch(pages, prefetch_pages)
+        return pages
 
-    def get_result_pages(self, request: Dict, url: str) -> Generator:
-        row_limit = API_ROW_LIMIT
-        start_row = 0
+    def _get_result_pages(self, request: Dict, url: str, start_row: int = 0,
+                          row_limit: int = API_ROW_LIMIT) -> Generator:
         last_page = False
         while not last_page:
             request["rowLimit"] = row_limit
@@ -89,38 +279,37 @@ class GoogleSearchConsoleClient:
 
     def execute_search_analytics_request(self, service, property_uri: str, request: Dict) -> Dict:
         try:
-            search_analytics_data = self._execute_search_analytics_request(service, property_uri, request)
-            if not search_analytics_data:
-                search_analytics_data = self._execute_search_analytics_request(service,
-                                                                               "".join(["sc-domain:", property_uri]),
-                                                                               request)
-            if not search_analytics_data:
-                search_analytics_data = self._execute_search_analytics_request(service,
-                                                                               "".join(["https://www.", property_uri]),
-                                                                               request)
-            if not search_analytics_data:
-                search_analytics_data = self._execute_search_analytics_request(service,
-                                                                               "".join(["http://www.", property_uri]),
-                                                                               request)
-            if not search_analytics_data:
-                search_analytics_data = self._execute_search_analytics_request(service,
-                                                                               "".join(["https://", property_uri]),
-                                                                               request)
-            if not search_analytics_data:
-                search_analytics_data = self._execute_search_analytics_request(service,
-                                                                               "".join(["http://", property_uri]),
-                                                                               request)
-            if not search_analytics_data:
+            site_url = self.resolve_property(property_uri)
+            search_analytics_data = self._execute_search_analytics_request(service, site_url, request)
+            if search_analytics_data is None and property_uri in self._unverified_properties:
+                logging.info(f"Access to cached property {site_url} was denied, resolving {property_uri} again")
+                site_url = self.resolve_property(property_uri, refresh=True)
+                search_analytics_data = self._execute_search_analytics_request(service, site_url, request)
+            if search_analytics_data is None:
                 raise ClientAuthError("Found no search analytics data. Make sure you have sufficient rights and the "
                                       "url is valid.")
             return search_analytics_data
-        except socket.timeout:
-            raise ClientError("Connection timed out, please try a smaller query")
+        except socket.timeout as timeout:
+            raise ClientTimeoutError("Connection timed out, please try a smaller query") from timeout
 
-    @retry(RetryableException, tries=3, delay=60, jitter=600)
     def _execute_search_analytics_request(self, service, property_uri: str, request: Dict) -> Dict:
+        cache_key = None
+        if self.response_cache is not None and self.response_cache.is_cacheable(request):
+            cache_key = self.response_cache.get_key(property_uri, request)
+            started = time.perf_counter()
+            response = self.response_cache.get(cache_key)
+            if response is not None:
+                self.metrics.record("response_cache.hit", property_uri, time.perf_counter() - started,
+                                    rows=len(response.get("rows", [])))
+                return response
+            self.metrics.record("response_cache.miss", property_uri, time.perf_counter() - started)
         try:
-            return service.searchanalytics().query(siteUrl=property_uri, body=request).execute()
+            response = self._execute_request(service.searchanalytics().query(siteUrl=property_uri, body=request),
+                                             self.search_analytics_rate_limiter, property_uri)
+            if cache_key is not None:
+                with self.metrics.measure("response_cache.put", property_uri):
+                    self.response_cache.put(cache_key, response)
+            return response
         except HttpError as http_error:
             logging.error(f"Encountered error when querying search analytics: {http_error}")
             if http_error.status_code == 403:
@@ -128,43 +317,178 @@ class GoogleSearchConsoleClient:
             else:
                 self._process_exception(http_error)
 
-    def get_sitemaps_data(self, url: str) -> List[Dict]:
-        sitemaps = self._get_sitemaps_data(url)
-        if not sitemaps:
-            sitemaps = self._get_sitemaps_data("".join(["sc-domain:", url]))
-        if not sitemaps:
-            sitemaps = self._get_sitemaps_data("".join(["https://www.", url]))
-        if not sitemaps:
-            sitemaps = self._get_sitemaps_data("".join(["http://www.", url]))
-        if not sitemaps:
-            sitemaps = self._get_sitemaps_data("".join(["https://", url]))
-        if not sitemaps:
-            sitemaps = self._get_sitemaps_data("".join(["http://", url]))
-        if not sitemaps:
+    def get_sitemaps_data(self, url: str, expand_indexes: bool = False, max_workers: int = 1) -> List[Dict]:
+        """
+        Returns the submitted sitemaps of url. With expand_indexes, the sitemaps listed in sitemap indexes follow,
+        each with the path of its index in sitemapIndex.
+        """
+        site_url = self.resolve_property(url)
+        sitemaps = self._get_sitemaps_data(site_url)
+        if sitemaps is None and url in self._unverified_properties:
+            logging.info(f"Access to cached property {site_url} was denied, resolving {url} again")
+            site_url = self.resolve_property(url, refresh=True)
+            sitemaps = self._get_sitemaps_data(site_url)
+        if sitemaps is None:
             raise ClientAuthError(f"{url} is not a valid Search Console site URL. Check the error log and make sure "
                                   f"you have sufficient rights and if the url is valid.")
+        if expand_indexes:
+            sitemaps = sitemaps + self.get_child_sitemaps(site_url, sitemaps, max_workers)
         return sitemaps
 
-    @retry(RetryableException, tries=3, delay=60, jitter=600)
+    def get_child_sitemaps(self, site_url: str, sitemaps: List[Dict], max_workers: int = 1) -> List[Dict]:
+        """
+        Lists the sitemaps of the sitemap indexes in sitemaps recursively. All indexes of one nesting level are listed
+        concurrently, so the number of round trips grows with the nesting depth instead of the number of indexes.
+        The listings share the DEFAULT_USER_QPM quota, which bounds the throughput whatever max_workers is.
+        """
+        child_sitemaps = []
+        listed_paths = {sitemap["path"] for sitemap in sitemaps}
+        index_paths = [sitemap["path"] for sitemap in sitemaps if sitemap.get("isSitemapsIndex")]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while index_paths:
+                level = executor.map(lambda index_path: self._get_child_sitemaps(site_url, index_path), index_paths)
+                next_index_paths = []
+                for index_path, children in zip(index_paths, level):
+                    for child in children:
+                        # indexes may list the same sitemap or refer to each other
+                        if child["path"] in listed_paths:
+                            continue
+                        listed_paths.add(child["path"])
+                        child["sitemapIndex"] = index_path
+                        child_sitemaps.append(child)
+                        if child.get("isSitemapsIndex"):
+                            next_index_paths.append(child["path"])
+                index_paths = next_index_paths
+        return child_sitemaps
+
+    def _get_child_sitemaps(self, site_url: str, index_path: str) -> List[Dict]:
+        try:
+            response = self._execute_request(self.service.sitemaps().list(siteUrl=site_url, sitemapIndex=index_path),
+                                             self.default_rate_limiter, site_url)
+        except HttpError as http_error:
+            if http_error.status_code == 404:
+                logging.warning(f"Sitemap index {index_path} was not found, its sitemaps are skipped")
+                return []
+            self._process_exception(http_error)
+        return response.get("sitemap", [])
+
     def _get_sitemaps_data(self, url: str) -> List[Dict]:
         try:
-            sitemaps = self.service.sitemaps().list(siteUrl=url).execute()["sitemap"]
-            return sitemaps
+            response = self._execute_request(self.service.sitemaps().list(siteUrl=url), self.default_rate_limiter,
+                                             url)
         except HttpError as http_error:
             if http_error.status_code == 403:
-                pass
-            else:
-                self._process_exception(http_error)
-        except KeyError:
+                return None
+            self._process_exception(http_error)
+        if "sitemap" not in response:
             raise ClientError(f"Could not fetch sitemaps from the API, the returned data did not contain the sitemaps. "
-                              f"Data returned :({self.service.sitemaps().list(siteUrl=url).execute()}) ")
+                              f"Data returned :({response}) ")
+        return response["sitemap"]
+
+    def inspect_url(self, url: str, inspection_url: str, language_code: Optional[str] = None) -> Optional[Dict]:
+        """
+        Returns the URL inspection result of inspection_url, which must belong to the property of url.
+        Returns None if the URL cannot be inspected, e.g. because it is not part of the property.
+        """
+        site_url = self.resolve_property(url)
+        try:
+            return self._inspect_url(site_url, inspection_url, language_code)
+        except ClientAuthError:
+            with self._resolve_lock:
+                unverified = url in self._unverified_properties
+                # another thread may have resolved the cached property again already
+                resolved_again = self._resolved_properties.get(url) != site_url
+            if not unverified and not resolved_again:
+                raise
+        logging.info(f"Access to cached property {site_url} was denied, resolving {url} again")
+        site_url = self.resolve_property(url, refresh=unverified)
+        return self._inspect_url(site_url, inspection_url, language_code)
+
+    def _inspect_url(self, site_url: str, inspection_url: str, language_code: Optional[str]) -> Optional[Dict]:
+        body = {"inspectionUrl": inspection_url, "siteUrl": site_url}
+        if language_code:
+            body["languageCode"] = language_code
+        try:
+            response = self._execute_request(self.service.urlInspection().index().inspect(body=body),
+                                             self.url_inspection_rate_limiter, site_url)
+        except HttpError as http_error:
+            if http_error.status_code in [400, 404]:
+                logging.warning(f"Could not inspect {inspection_url}: {http_error}")
+                return None
+            if http_error.status_code == 403:
+                raise ClientAuthError(f"Access to URL inspection of {site_url} was denied, make sure you have "
+                                      f"sufficient rights.") from http_error
+            self._process_exception(http_error)
+        return response.get("inspectionResult", {})
+
+    def _execute_request(self, request, rate_limiter: RateLimiter, site_url: Optional[str] = None) -> Dict:
+        """Executes an API request within the rate limiter, quota errors are retried after the necessary backoff."""
+        metric = getattr(request, "methodId", None) or "request"
+        domain = site_url or ""
+        retries = 0
+        while True:
+            waited = rate_limiter.acquire(site_url)
+            if waited:
+                self.metrics.record("rate_limiter_wait", domain, seconds=waited)
+            http = self._acquire_http()
+            received_bytes = http.received_bytes
+            started = time.perf_counter()
+            try:
+                response = request.execute(http=http)
+            except HttpError as http_error:
+                self.metrics.record(metric, domain, time.perf_counter() - started,
+                                    http.received_bytes - received_bytes, error=True)
+                reason = self._get_error_reason(http_error)
+                if self._is_retryable(http_error):
+                    self.metrics.record(f"quota_error.{reason or http_error.status_code}", domain)
+                if not self._is_retryable(http_error) or retries >= MAX_RETRIES:
+                    raise
+                retries += 1
+                backoff = rate_limiter.on_throttled(self._get_retry_after(http_error))
+                self.metrics.record("retry_backoff", domain, seconds=backoff)
+                logging.warning(f"API quota exceeded ({reason}), retrying in {backoff:.1f} seconds "
+                                f"({retries}/{MAX_RETRIES})")
+                continue
+            except Exception:
+                # timeouts and connection errors are the slow requests the metrics should expose
+                self.metrics.record(metric, domain, time.perf_counter() - started,
+                                    http.received_bytes - received_bytes, error=True)
+                raise
+            else:
+                self.metrics.record(metric, domain, time.perf_counter() - started,
+                                    http.received_bytes - received_bytes,
+                                    len(response.get("rows", [])) if isinstance(response, dict) else 0)
+            finally:
+                self._release_http(http)
+            rate_limiter.on_success()
+            return response
+
+    @classmethod
+    def _is_retryable(cls, http_error: HttpError) -> bool:
+        return http_error.status_code == 429 or cls._get_error_reason(http_error) in RETRYABLE_ERROR_CODES
 
     @staticmethod
-    def _process_exception(http_error):
+    def _get_error_reason(http_error: HttpError) -> str:
+        try:
+            return http_error.error_details[0]["reason"]
+        except (TypeError, IndexError, KeyError):
+            return ""
+
+    @staticmethod
+    def _get_retry_after(http_error: HttpError) -> Optional[float]:
+        try:
+            return float(http_error.resp.get("retry-after"))
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def _process_exception(cls, http_error):
         try:
             logging.error(http_error.error_details)
-            if http_error.error_details[0]["reason"] in RETRYABLE_ERROR_CODES:
-                raise RetryableException(http_error.error_details[0]["reason"]) from http_error
+            if cls._is_retryable(http_error):
+                raise ClientError(f"API quota exceeded ({cls._get_error_reason(http_error)}) even after "
+                                  f"{MAX_RETRIES} retries, please try again later or lower the number of parallel "
+                                  f"requests.") from http_error
             else:
                 if http_error.reason == 'Request contains an invalid argument.':
                     raise ClientError("Request contains an invalid argument. Make sure all your dimensions and "
@@ -1,10 +1,10 @@
-class RetryableException(Exception):
+class ClientAuthError(Exception):
     pass
 
 
-class ClientAuthError(Exception):
+class ClientError(Exception):
     pass
 
 
-class ClientError(Exception):
+class ClientTimeoutError(ClientError):
     pass
@@ -0,0 +1,99 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Generator, List, Tuple, Union
+
+METRICS_COLUMNS = ["metric", "domain", "count", "errors", "seconds", "max_seconds", "bytes", "rows"]
+
+
+class OperationStats:
+    __slots__ = ["count", "errors", "seconds", "max_seconds", "bytes", "rows"]
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.rows = 0
+
+
+class Measurement:
+    """Sizes of a measured operation, filled in by the caller."""
+    __slots__ = ["bytes", "rows"]
+
+    def __init__(self) -> None:
+        self.bytes = 0
+        self.rows = 0
+
+
+class RunMetrics:
+    """Thread safe timings and counters of a run, aggregated by metric name and domain."""
+
+    def __init__(self) -> None:
+        self._stats: Dict[Tuple[str, str], OperationStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, metric: str, domain: str = "", seconds: float = 0.0, bytes_count: int = 0, rows: int = 0,
+               error: bool = False) -> None:
+        with self._lock:
+            stats = self._stats.get((metric, domain))
+            if stats is None:
+                stats = self._stats[(metric, domain)] = OperationStats()
+            stats.count += 1
+            stats.errors += error
+            stats.seconds += seconds
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            stats.bytes += bytes_count
+            stats.rows += rows
+
+    @contextmanager
+    def measure(self, metric: str, domain: str = "") -> Generator[Measurement, None, None]:
+        measurement = Measurement()
+        started = time.perf_counter()
+        error = False
+        try:
+            yield measurement
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(metric, domain, time.perf_counter() - started, measurement.bytes, measurement.rows, error)
+
+    def get_totals(self, metric: str) -> OperationStats:
+        """Returns the stats of a metric summed over all domains."""
+        totals = OperationStats()
+        with self._lock:
+            for (stats_metric, _), stats in self._stats.items():
+                if stats_metric == metric:
+                    totals.count += stats.count
+                    totals.errors += stats.errors
+                    totals.seconds += stats.seconds
+                    totals.max_seconds = max(totals.max_seconds, stats.max_seconds)
+                    totals.bytes += stats.bytes
+                    totals.rows += stats.rows
+        return totals
+
+    def get_metric_names(self, prefix: Union[str, Tuple[str, ...]] = "") -> List[str]:
+        with self._lock:
+            return sorted({metric for metric, _ in self._stats if metric.startswith(prefix)})
+
+    def get_rows(self) -> List[List]:
+        """Returns the stats as rows laid out as METRICS_COLUMNS."""
+        with self._lock:
+            return [[metric, domain, stats.count, stats.errors, round(stats.seconds, 6), round(stats.max_seconds, 6),
+                     stats.bytes, stats.rows]
+                    for (metric, domain), stats in sorted(self._stats.items())]
+
+
+class MeteredHttp:
+    """Wraps an httplib2 compatible transport and counts the received bytes, an instance must not be shared."""
+
+    def __init__(self, http) -> None:
+        self.http = http
+        self.received_bytes = 0
+
+    def request(self, *args, **kwargs):
+        response, content = self.http.request(*args, **kwargs)
+        self.received_bytes += len(content or b"")
+        return response, content
@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# Search Console API usage limits, see https://developers.google.com/webmaster-tools/limits
+SEARCH_ANALYTICS_USER_QPM = 1200
+SEARCH_ANALYTICS_SITE_QPM = 1200
+# quota of the other resources, sites and sitemaps included
+DEFAULT_USER_QPM = 200
+URL_INSPECTION_USER_QPM = 10000
+URL_INSPECTION_SITE_QPM = 600
+URL_INSPECTION_SITE_QPD = 2000
+
+MIN_RATE_RATIO = 0.05
+RATE_INCREASE_STEP = 0.05
+BASE_BACKOFF_SECONDS = 1
+MAX_BACKOFF_SECONDS = 64
+
+
+class TokenBucket:
+    def __init__(self, queries_per_minute: float) -> None:
+        self.max_rate = queries_per_minute / 60
+        self.rate = self.max_rate
+        # allow a burst of one second worth of queries
+        self.capacity = max(1.0, self.max_rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, now: float) -> float:
+        """Takes a token and returns the number of seconds the caller has to wait before using it."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class RateLimiter:
+    """
+    Client side scheduler shared by all threads calling one API quota group.
+
+    Queries are admitted by a per-user token bucket and an optional per-site token bucket. The allowed rate is
+    controlled by AIMD: it is halved whenever the API reports a quota error and grows additively with every
+    successful call until it reaches the quota again.
+    """
+
+    def __init__(self, user_queries_per_minute: float, site_queries_per_minute: Optional[float] = None) -> None:
+        self.user_bucket = TokenBucket(user_queries_per_minute)
+        self.site_queries_per_minute = site_queries_per_minute
+        self.site_buckets: Dict[str, TokenBucket] = {}
+        self.rate_ratio = 1.0
+        self.consecutive_throttles = 0
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, site_url: Optional[str] = None) -> float:
+        """Blocks until a query may be sent, returns the number of seconds waited."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(self.paused_until - now, 0.0)
+            wait = max(wait, self.user_bucket.reserve(now))
+            if site_url and self.site_queries_per_minute:
+                wait = max(wait, self._get_site_bucket(site_url).reserve(now))
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.consecutive_throttles = 0
+            if self.rate_ratio < 1.0:
+                self._set_rate_ratio(self.rate_ratio + RATE_INCREASE_STEP)
+
+    def on_throttled(self, retry_after: Optional[float] = None) -> float:
+        """Slows down after a quota error, returns the pause applied to all queries of this limiter."""
+        with self._lock:
+            self.consecutive_throttles += 1
+            self._set_rate_ratio(self.rate_ratio / 2)
+            if retry_after is not None:
+                backoff = retry_after
+            else:
+                backoff = min(BASE_BACKOFF_SECONDS * 2 ** (self.consecutive_throttles - 1), MAX_BACKOFF_SECONDS)
+            self.paused_until = max(self.paused_until, time.monotonic() + backoff)
+            return backoff
+
+    def _get_site_bucket(self, site_url: str) -> TokenBucket:
+        if site_url not in self.site_buckets:
+            bucket = TokenBucket(self.site_queries_per_minute)
+            bucket.rate = bucket.max_rate * self.rate_ratio
+            self.site_buckets[site_url] = bucket
+        return self.site_buckets[site_url]
+
+    def _set_rate_ratio(self, rate_ratio: float) -> None:
+        self.rate_ratio = min(max(rate_ratio, MIN_RATE_RATIO), 1.0)
+        for bucket in [self.user_bucket, *self.site_buckets.values()]:
+            bucket.rate = bucket.max_rate * self.rate_ratio
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tarfile
+import tempfile
+import threading
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+# Search Console data older than this many days is final, responses covering only such days never change
+FINAL_DATA_AGE_DAYS = 3
+DEFAULT_MAX_SIZE_MB = 64
+ENTRY_SUFFIX = ".json.gz"
+
+
+class ResponseCache:
+    """
+    Thread safe on-disk cache of search analytics responses, content addressed by the property and the request body.
+
+    Only responses of finalized date ranges are cached. Once the entries exceed max_bytes, the least recently used
+    entries are evicted. Without a directory, the entries are kept in a temporary directory removed by close.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = DEFAULT_MAX_SIZE_MB * 2 ** 20) -> None:
+        self._temporary_directory = None if directory else tempfile.TemporaryDirectory()
+        self.directory = directory or self._temporary_directory.name
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        # responses put since the cache was created, the archive needs to be saved again only if there are any
+        self.writes = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self._sizes = {entry.name: entry.stat().st_size for entry in os.scandir(self.directory)
+                       if entry.name.endswith(ENTRY_SUFFIX)}
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    @staticmethod
+    def is_cacheable(request: Dict) -> bool:
+        """Fresh data and date ranges that are not final yet can change, their responses are not cached."""
+        if request.get("dataState", "final") != "final":
+            return False
+        return date.fromisoformat(request["endDate"]) <= date.today() - timedelta(days=FINAL_DATA_AGE_DAYS)
+
+    @staticmethod
+    def get_key(site_url: str, request: Dict) -> str:
+        """The request contains startRow and rowLimit, so every page has its own key."""
+        content = json.dumps([site_url, request], sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        name = key + ENTRY_SUFFIX
+        with self._lock:
+            cached = name in self._sizes
+        if not cached:
+            with self._lock:
+                self.misses += 1
+            return None
+        entry_path = os.path.join(self.directory, name)
+        try:
+            with gzip.open(entry_path, "rt", encoding="utf-8") as entry_file:
+                response = json.load(entry_file)
+            # the modification time orders the entries for the eviction
+            os.utime(entry_path)
+        except (OSError, ValueError) as error:
+            logging.warning(f"Discarding unreadable cached response {name}: {error}")
+            self._remove(name)
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return response
+
+    def put(self, key: str, response: Dict) -> None:
+        name = key + ENTRY_SUFFIX
+        entry_path = os.path.join(self.directory, name)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "wb") as raw_file, \
+                gzip.open(raw_file, "wt", encoding="utf-8", compresslevel=1) as entry_file:
+            json.dump(response, entry_file, separators=(",", ":"))
+        # entries appear atomically, so concurrent readers never see a partially written response
+        os.replace(temporary_path, entry_path)
+        with self._lock:
+            self._sizes[name] = os.path.getsize(entry_path)
+            self.writes += 1
+            over_limit = sum(self._sizes.values()) > self.max_bytes
+        if over_limit:
+            self.evict()
+
+    def evict(self) -> None:
+        """Removes the least recently used entries until the cache fits into max_bytes."""
+        with self._lock:
+            names = list(self._sizes)
+        entries = []
+        for name in names:
+            try:
+                entries.append((os.path.getmtime(os.path.join(self.directory, name)), name))
+            except OSError:
+                self._remove(name)
+        total = self.size
+        for _, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            total -= self._sizes.get(name, 0)
+            self._remove(name)
+
+    def close(self) -> None:
+        """Removes the temporary directory of the entries, a directory passed by the caller is kept."""
+        if self._temporary_directory is not None:
+            self._temporary_directory.cleanup()
+
+    def _remove(self, name: str) -> None:
+        with self._lock:
+            self._sizes.pop(name, None)
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except FileNotFoundError:
+            pass
+
+    def save_archive(self, archive_path: str) -> None:
+        """Packs the entries into an uncompressed tar archive, the entries are compressed already."""
+        with tarfile.open(archive_path, "w") as archive:
+            with self._lock:
+                names = sorted(self._sizes)
+            for name in names:
+                archive.add(os.path.join(self.directory, name), arcname=name)
+
+    def load_archive(self, archive_path: str) -> None:
+        """Adds the entries of an archive written by save_archive, unknown members are ignored."""
+        with tarfile.open(archive_path, "r") as archive:
+            for member in archive.getmembers():
+                name = os.path.basename(member.name)
+                if not member.isfile() or name != member.name or not name.endswith(ENTRY_SUFFIX):
+                    continue
+                archive.extract(member, self.directory)
+                with self._lock:
+                    self._sizes[name] = member.size
+        if self.size > self.max_bytes:
+            self.evict()
@@ -0,0 +1,139 @@
+import logging
+import math
+import time
+from datetime import date
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from google_search_console import GoogleSearchConsoleClient
+from google_search_console.client import API_ROW_LIMIT
+from google_search_console.rate_limiter import SEARCH_ANALYTICS_SITE_QPM
+
+# a shard is sized to be fetched in about this many pages, so slow pages do not add up to a timeout
+TARGET_SHARD_ROWS = 4 * API_ROW_LIMIT
+# rows of the sample probe of the report dimensions, a fraction of a full page keeps the probe fast
+SAMPLE_ROW_LIMIT = 1000
+MAX_PLANNED_WORKERS = 16
+
+PLAN_COLUMNS = ["report", "domain", "date_from", "date_to", "days_with_data", "estimated_rows_per_day",
+                "estimated_rows", "shard_days", "queries", "expected_requests"]
+
+
+class QueryPlan(NamedTuple):
+    report: str
+    domain: str
+    date_from: date
+    date_to: date
+    days_with_data: int
+    estimated_rows_per_day: int
+    estimated_rows: int
+    shard_days: int
+    queries: int
+    expected_requests: int
+
+
+class QueryPlanner:
+    """
+    Estimates the size of search analytics extractions from cheap probe queries and lays them out into date shards.
+
+    Two probes are run per report, domain and filter group: a date-only aggregate of the whole date range and a
+    sample of SAMPLE_ROW_LIMIT rows of the report dimensions on the day with the most impressions. The row count of
+    the sampled day is scaled by the impressions of the other days.
+    """
+
+    def __init__(self, gsc_client: GoogleSearchConsoleClient, include_fresh: bool = False) -> None:
+        self.gsc_client = gsc_client
+        self.include_fresh = include_fresh
+        self.probe_requests = 0
+        self.probe_seconds = 0.0
+
+    def plan(self, report: str, domain: str, date_from: date, date_to: date, dimensions: List[str],
+             search_type: Optional[str], filter_groups: Sequence[Tuple[Dict, ...]] = ((),)) -> QueryPlan:
+        days = (date_to - date_from).days + 1
+        group_daily_rows = [rows for rows in (self.get_daily_row_counts(domain, date_from, date_to, dimensions,
+                                                                        search_type, filter_group)
+                                              for filter_group in filter_groups) if rows]
+        if not group_daily_rows:
+            return QueryPlan(report, domain, date_from, date_to, 0, 0, 0, days, len(filter_groups),
+                             len(filter_groups))
+        days_with_data = len(set().union(*group_daily_rows))
+        rows_per_day = max(max(daily_rows.values()) for daily_rows in group_daily_rows)
+
+        if "date" in dimensions:
+            estimated_rows = sum(sum(daily_rows.values()) for daily_rows in group_daily_rows)
+            shard_days = min(max(TARGET_SHARD_ROWS // max(rows_per_day, 1), 1), days)
+            shards = math.ceil(days / shard_days)
+            group_rows = max(sum(daily_rows.values()) for daily_rows in group_daily_rows)
+            pages_per_shard = math.floor(min(rows_per_day * shard_days, group_rows) / API_ROW_LIMIT) + 1
+        else:
+            # rows of different days aggregate into one row per key, the busiest day is a lower bound
+            estimated_rows = sum(max(daily_rows.values()) for daily_rows in group_daily_rows)
+            shard_days = days
+            shards = 1
+            pages_per_shard = math.floor(rows_per_day / API_ROW_LIMIT) + 1
+        queries = shards * len(filter_groups)
+        return QueryPlan(report, domain, date_from, date_to, days_with_data, rows_per_day, estimated_rows,
+                         shard_days, queries, queries * pages_per_shard)
+
+    def get_daily_row_counts(self, domain: str, date_from: date, date_to: date, dimensions: List[str],
+                             search_type: Optional[str], filter_group: Tuple[Dict, ...]) -> Dict[str, int]:
+        impressions = self.get_daily_impressions(domain, date_from, date_to, search_type, filter_group)
+        if not impressions:
+            return {}
+        sample_day = max(impressions, key=impressions.get)
+        sample_rows = self.get_sample_row_count(domain, sample_day, impressions[sample_day], dimensions, search_type,
+                                                filter_group)
+        return {day: math.ceil(sample_rows * day_impressions / impressions[sample_day])
+                for day, day_impressions in impressions.items()}
+
+    def get_daily_impressions(self, domain: str, date_from: date, date_to: date, search_type: Optional[str],
+                              filter_group: Tuple[Dict, ...] = ()) -> Dict[str, float]:
+        pages = self._probe(domain, date_from, date_to, ["date"], search_type, filter_group)
+        return {row["keys"][0]: row["impressions"] for page in pages for row in page if row["impressions"]}
+
+    def get_sample_row_count(self, domain: str, day: str, day_impressions: float, dimensions: List[str],
+                             search_type: Optional[str], filter_group: Tuple[Dict, ...] = ()) -> int:
+        """
+        Rows of the day, exact below SAMPLE_ROW_LIMIT. A full sample is scaled by the share of the impressions of
+        the day it covers. Rows are sorted by clicks, so the rest of the rows has fewer impressions per row than the
+        sample and the estimate is a lower bound.
+        """
+        sample_day = date.fromisoformat(day)
+        pages = self._probe(domain, sample_day, sample_day, dimensions, search_type, filter_group,
+                            row_limit=SAMPLE_ROW_LIMIT)
+        rows = [row for page in pages for row in page]
+        sample_impressions = sum(row.get("impressions", 0) for row in rows)
+        if len(rows) < SAMPLE_ROW_LIMIT or not sample_impressions:
+            return len(rows)
+        return max(math.ceil(len(rows) * day_impressions / sample_impressions), len(rows))
+
+    def get_workers(self, queries: int) -> int:
+        """Enough workers to use the per-site quota given the latency of the probes."""
+        latency = self.probe_seconds / self.probe_requests if self.probe_requests else 1.0
+        quota_workers = math.ceil(SEARCH_ANALYTICS_SITE_QPM / 60 * latency)
+        return max(min(quota_workers, queries, MAX_PLANNED_WORKERS), 1)
+
+    @staticmethod
+    def get_expected_seconds(expected_requests: int, workers: int, latency: float) -> float:
+        requests_per_second = min(SEARCH_ANALYTICS_SITE_QPM / 60, workers / latency if latency else math.inf)
+        return expected_requests / requests_per_second
+
+    def _probe(self, domain: str, date_from: date, date_to: date, dimensions: List[str], search_type: Optional[str],
+               filter_group: Tuple[Dict, ...], row_limit: Optional[int] = None) -> List[List[Dict]]:
+        """Fetches all pages, or only the first page of row_limit rows if it is set."""
+        pages = []
+        paged_data = self.gsc_client.get_search_analytics_data(date_from, date_to, domain, dimensions, search_type,
+                                                               [list(filter_group)] if filter_group else [],
+                                                               self.include_fresh,
+                                                               row_limit=row_limit or API_ROW_LIMIT)
+        started = time.perf_counter()
+        try:
+            for page in paged_data:
+                pages.append(page)
+                if row_limit:
+                    break
+        finally:
+            paged_data.close()
+        self.probe_requests += max(len(pages), 1)
+        self.probe_seconds += time.perf_counter() - started
+        logging.debug(f"Probed {dimensions} of {domain} from {date_from} to {date_to}: {len(pages)} pages")
+        return pages
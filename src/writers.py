@@ -0,0 +1,47 @@
+import csv
+import gzip
+from abc import ABC, abstractmethod
+from os import path
+from typing import Iterable, List, Sequence
+
+OUTPUT_FORMAT_CSV = "csv"
+OUTPUT_FORMAT_CSV_GZIP = "csv_gzip"
+OUTPUT_FORMATS = [OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_CSV_GZIP]
+
+
+class SliceWriter(ABC):
+    """Writes rows positionally aligned with the table columns into one slice of a sliced table."""
+
+    def get_slice_path(self, table_path: str, slice_name: str) -> str:
+        return path.join(table_path, slice_name)
+
+    @abstractmethod
+    def write(self, slice_path: str, rows: Iterable[List]) -> None:
+        pass
+
+    def write_columns(self, slice_path: str, columns: List[Sequence]) -> None:
+        """Writes equally long columns laid out as the table columns."""
+        self.write(slice_path, zip(*columns))
+
+
+class CsvSliceWriter(SliceWriter):
+    """Writes headless CSV slices."""
+
+    def write(self, slice_path: str, rows: Iterable[List]) -> None:
+        with open(slice_path, mode='wt', encoding='utf-8', newline='') as out_file:
+            csv.writer(out_file).writerows(rows)
+
+
+class GzipCsvSliceWriter(CsvSliceWriter):
+    """Writes gzip compressed headless CSV slices, Keboola Storage decompresses them on import."""
+
+    def __init__(self, compress_level: int = 6) -> None:
+        self.compress_level = compress_level
+
+    def get_slice_path(self, table_path: str, slice_name: str) -> str:
+        return path.join(table_path, f"{slice_name}.gz")
+
+    def write(self, slice_path: str, rows: Iterable[List]) -> None:
+        with gzip.open(slice_path, mode='wt', encoding='utf-8', newline='',
+                       compresslevel=self.compress_level) as out_file:
+            csv.writer(out_file).writerows(rows)
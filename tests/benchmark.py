@@ -0,0 +1,177 @@
+"""
+Throughput benchmark of the extraction running against the offline Search Console API simulator.
+
+Every scenario runs in its own process so the peak RSS is measured per scenario. Usage:
+
+    python tests/benchmark.py [--scenario NAME] [--latency SECONDS] [--quota-pacing]
+    python tests/benchmark.py --startup
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.dirname(os.path.realpath(__file__)) + "/../src")
+
+from simulator import SearchConsoleSimulator  # noqa: E402
+from google_search_console import GoogleSearchConsoleClient  # noqa: E402
+from google_search_console.rate_limiter import RateLimiter  # noqa: E402
+
+UNLIMITED_QPM = 10 ** 9
+STARTUP_RUNS = 5
+SRC_PATH = os.path.dirname(os.path.realpath(__file__)) + "/../src"
+STARTUP_SCRIPT = """
+import json, time
+started = time.perf_counter()
+import component
+imported = time.perf_counter()
+from google_search_console import GoogleSearchConsoleClient
+GoogleSearchConsoleClient(None, http=object())
+component.Component.parse_date("2021-03-01")
+print(json.dumps({"import_ms": (imported - started) * 1000, "client_ms": (time.perf_counter() - imported) * 1000}))
+"""
+
+SCENARIOS = {
+    # one query of 40 full pages
+    "1m_rows_40_pages": {"domains": 1, "rows_per_query": 1000000,
+                         "parameters": {"search_analytics_dimensions": "query, page"}},
+    # batch mode over many small properties
+    "30_domains": {"domains": 30, "rows_per_query": 30000,
+                   "parameters": {"search_analytics_dimensions": "date, query"}},
+    # four weeks sharded by day, 28 concurrent queries
+    "28_daily_shards": {"domains": 1, "rows_per_query": 25000,
+                        "parameters": {"search_analytics_dimensions": "date, query",
+                                       "extraction_options": {"date_shard_days": 1, "max_workers": 8}}},
+    "1m_rows_gzip": {"domains": 1, "rows_per_query": 1000000,
+                     "parameters": {"search_analytics_dimensions": "query, page",
+                                    "loading_options": {"incremental": 0, "output_format": "csv_gzip"}}},
+    "sitemaps_30_domains": {"domains": 30, "sitemaps_per_site": 200,
+                            "parameters": {"endpoint": "Sitemaps"}},
+    # 20 sitemap indexes of 50 sitemaps per domain, listed concurrently
+    "sitemap_indexes_30_domains": {"domains": 30, "sitemaps_per_site": 20, "sitemaps_per_index": 50,
+                                   "parameters": {"endpoint": "Sitemaps", "expand_sitemap_indexes": True}},
+}
+
+
+def get_configuration(scenario: Dict) -> Dict:
+    parameters = {"endpoint": "Search analytics",
+                  "out_table_name": "benchmark",
+                  "date_range": "Custom",
+                  "date_from": "2021-03-01",
+                  "date_to": "2021-03-28"}
+    domains = [f"benchmark-{i}.com" for i in range(scenario["domains"])]
+    if len(domains) == 1:
+        parameters["domain"] = domains[0]
+    else:
+        parameters["domains"] = domains
+    parameters.update(scenario["parameters"])
+    return {"parameters": parameters}
+
+
+def run_scenario(name: str, latency: float, quota_pacing: bool) -> Dict:
+    scenario = SCENARIOS[name]
+    configuration = get_configuration(scenario)
+    data_dir = tempfile.mkdtemp()
+    try:
+        for folder in ["in", "out/tables", "out/files"]:
+            os.makedirs(os.path.join(data_dir, folder))
+        with open(os.path.join(data_dir, "config.json"), "w") as config_file:
+            json.dump(configuration, config_file)
+        os.environ["KBC_DATADIR"] = data_dir
+
+        from component import Component
+        component = Component()
+        logging.getLogger().setLevel(logging.WARNING)
+
+        sites = [f"sc-domain:benchmark-{i}.com" for i in range(scenario["domains"])]
+        simulator = SearchConsoleSimulator(sites, rows_per_query=scenario.get("rows_per_query", 0),
+                                           sitemaps_per_site=scenario.get("sitemaps_per_site", 0),
+                                           sitemaps_per_index=scenario.get("sitemaps_per_index", 0), latency=latency)
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        if not quota_pacing:
+            client.search_analytics_rate_limiter = RateLimiter(UNLIMITED_QPM)
+            client.default_rate_limiter = RateLimiter(UNLIMITED_QPM)
+
+        started = time.perf_counter()
+        domains = component.get_domains(client)
+        if configuration["parameters"]["endpoint"] == "Sitemaps":
+            component.fetch_and_write_sitemaps_data(client, domains)
+            rows = scenario["domains"] * scenario["sitemaps_per_site"] * (1 + scenario.get("sitemaps_per_index", 0))
+        else:
+            component.fetch_and_write_search_analytics_data(client, domains)
+            rows = simulator.rows_served
+        elapsed = time.perf_counter() - started
+    finally:
+        shutil.rmtree(data_dir)
+
+    return {"scenario": name,
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed),
+            "requests": simulator.request_count,
+            "mb_received": round(simulator.bytes_served / 2 ** 20, 1),
+            # ru_maxrss is reported in kilobytes on Linux
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+
+def run_in_subprocess(name: str, latency: float, quota_pacing: bool) -> Dict:
+    command = [sys.executable, os.path.realpath(__file__), "--scenario", name, "--latency", str(latency), "--json"]
+    if quota_pacing:
+        command.append("--quota-pacing")
+    output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def measure_startup() -> Dict:
+    """Measures a cold start in fresh interpreters: importing the component and building the API client."""
+    runs = []
+    for _ in range(STARTUP_RUNS):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=SRC_PATH, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        run = json.loads(output.splitlines()[-1])
+        run["process_ms"] = (time.perf_counter() - started) * 1000
+        runs.append(run)
+    return {"scenario": "startup",
+            **{metric: round(statistics.median(run[metric] for run in runs), 1) for metric in runs[0]}}
+
+
+def print_results(results: List[Dict]) -> None:
+    columns = list(results[0])
+    widths = [max(len(column), *(len(str(result[column])) for result in results)) for column in columns]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    for result in results:
+        print("  ".join(str(result[column]).ljust(width) for column, width in zip(columns, widths)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=list(SCENARIOS), help="run a single scenario, all by default")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated latency of every API request")
+    parser.add_argument("--quota-pacing", action="store_true",
+                        help="pace requests by the API quota like in production instead of running unthrottled")
+    parser.add_argument("--json", action="store_true", help="run in the current process and print JSON")
+    parser.add_argument("--startup", action="store_true", help="measure the cold start time instead")
+    args = parser.parse_args()
+
+    if args.startup:
+        print_results([measure_startup()])
+        return
+    if args.json:
+        print(json.dumps(run_scenario(args.scenario, args.latency, args.quota_pacing)))
+        return
+    names = [args.scenario] if args.scenario else list(SCENARIOS)
+    print_results([run_in_subprocess(name, args.latency, args.quota_pacing) for name in names])
+
+
+if __name__ == "__main__":
+    main()
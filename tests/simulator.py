@@ -0,0 +1,194 @@
+"""
+Offline stand-in for the Search Console v1 API.
+
+SearchConsoleSimulator implements the httplib2 request interface, so it can be passed as the http transport of
+GoogleSearchConsoleClient. Requests are built and responses parsed by the real googleapiclient discovery service, only
+the network is replaced by synthetic responses.
+"""
+import json
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from httplib2 import Response
+
+API_PATH_PREFIX = "/webmasters/v3/sites"
+URL_INSPECTION_PATH = "/v1/urlInspection/index:inspect"
+DEFAULT_PERMISSION_LEVEL = "siteOwner"
+
+
+class SearchConsoleSimulator:
+    """
+    Serves synthetic sites.list, sites.get, searchanalytics.query, sitemaps.list and urlInspection.index.inspect
+    responses.
+
+    Only the properties in sites are accessible, any other property URL variant gets a 403 response like the real API.
+    Every search analytics query returns rows_per_query rows in pages of the requested rowLimit. The first
+    quota_errors search analytics requests and the first sitemaps_quota_errors sitemaps requests are refused with a 429
+    rateLimitExceeded error. With sitemaps_per_index, the submitted sitemaps are sitemap indexes listing that many
+    sitemaps each, listing one of invalid_sitemap_indexes fails with a 400 invalid argument error.
+    """
+
+    def __init__(self, sites: List[str], rows_per_query: int = 1000, sitemaps_per_site: int = 3,
+                 latency: float = 0.0, quota_errors: int = 0, retry_after: Optional[float] = 0,
+                 list_sites: bool = True, sitemaps_per_index: int = 0, sitemaps_quota_errors: int = 0,
+                 invalid_sitemap_indexes: Sequence[str] = ()) -> None:
+        self.sites = {site_url: DEFAULT_PERMISSION_LEVEL for site_url in sites}
+        self.rows_per_query = rows_per_query
+        self.sitemaps_per_site = sitemaps_per_site
+        self.sitemaps_per_index = sitemaps_per_index
+        self.invalid_sitemap_indexes = set(invalid_sitemap_indexes)
+        self.latency = latency
+        self.retry_after = retry_after
+        self.list_sites = list_sites
+        self.request_counts = Counter()
+        self.rows_served = 0
+        self.bytes_served = 0
+        self._quota_errors_left = quota_errors
+        self._sitemaps_quota_errors_left = sitemaps_quota_errors
+        self._lock = threading.Lock()
+
+    @property
+    def request_count(self) -> int:
+        return sum(self.request_counts.values())
+
+    def request(self, uri: str, method: str = "GET", body: Optional[str] = None, headers: Optional[Dict] = None,
+                redirections: int = 5, connection_type=None) -> Tuple[Response, bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        if urlparse(uri).path == URL_INSPECTION_PATH:
+            return self._respond("urlInspection.index.inspect", *self._inspect_url(json.loads(body)))
+        path_parts = urlparse(uri).path[len(API_PATH_PREFIX):].strip("/").split("/")
+        site_url = unquote(path_parts[0]) if path_parts[0] else None
+        resource = "/".join(path_parts[1:])
+
+        if site_url is None:
+            api_method = "sites.list"
+            status, content = self._list_sites()
+        elif resource == "searchAnalytics/query" and method == "POST":
+            api_method = "searchanalytics.query"
+            status, content = self._query(site_url, json.loads(body))
+        elif resource == "sitemaps":
+            api_method = "sitemaps.list"
+            sitemap_index = parse_qs(urlparse(uri).query).get("sitemapIndex", [None])[0]
+            status, content = self._list_sitemaps(site_url, sitemap_index)
+        elif not resource:
+            api_method = "sites.get"
+            status, content = self._get_site(site_url)
+        else:
+            api_method = "unknown"
+            status, content = self._error(404, "notFound", "Requested entity was not found.")
+        return self._respond(api_method, status, content)
+
+    def _respond(self, api_method: str, status: int, content) -> Tuple[Response, bytes]:
+        content = content.encode("utf-8") if isinstance(content, str) else content
+        with self._lock:
+            self.request_counts[api_method] += 1
+            self.bytes_served += len(content)
+        response_headers = {"status": status, "content-type": "application/json; charset=UTF-8"}
+        if status == 429 and self.retry_after is not None:
+            response_headers["retry-after"] = str(self.retry_after)
+        return Response(response_headers), content
+
+    def _list_sites(self) -> Tuple[int, str]:
+        if not self.list_sites:
+            return 200, "{}"
+        return 200, json.dumps({"siteEntry": [{"siteUrl": site_url, "permissionLevel": permission_level}
+                                              for site_url, permission_level in self.sites.items()]})
+
+    def _get_site(self, site_url: str) -> Tuple[int, str]:
+        if site_url not in self.sites:
+            return self._forbidden(site_url)
+        return 200, json.dumps({"siteUrl": site_url, "permissionLevel": self.sites[site_url]})
+
+    def _query(self, site_url: str, request: Dict) -> Tuple[int, bytes]:
+        if site_url not in self.sites:
+            return self._forbidden(site_url)
+        with self._lock:
+            if self._quota_errors_left:
+                self._quota_errors_left -= 1
+                throttled = True
+            else:
+                throttled = False
+        if throttled:
+            return self._error(429, "rateLimitExceeded", "Quota exceeded for quota metric 'Queries'.")
+
+        start_row = request.get("startRow", 0)
+        row_count = max(min(request.get("rowLimit", 1000), self.rows_per_query - start_row), 0)
+        with self._lock:
+            self.rows_served += row_count
+        if not row_count:
+            return 200, b'{"responseAggregationType": "byPage"}'
+        return 200, get_page(tuple(request.get("dimensions", [])), request["startDate"], request["endDate"],
+                             start_row, row_count)
+
+    def _list_sitemaps(self, site_url: str, sitemap_index: Optional[str] = None) -> Tuple[int, str]:
+        if site_url not in self.sites:
+            return self._forbidden(site_url)
+        with self._lock:
+            throttled = self._sitemaps_quota_errors_left > 0
+            self._sitemaps_quota_errors_left -= throttled
+        if throttled:
+            return self._error(429, "rateLimitExceeded", "Quota exceeded for quota metric 'Queries'.")
+        if sitemap_index in self.invalid_sitemap_indexes:
+            return self._error(400, "invalid", "Request contains an invalid argument.")
+        if sitemap_index is None:
+            prefix, count = f"{site_url.rstrip('/')}/sitemap", self.sitemaps_per_site
+            is_index = self.sitemaps_per_index > 0
+        else:
+            prefix, count, is_index = sitemap_index[:-len(".xml")], self.sitemaps_per_index, False
+        sitemaps = [{"path": f"{prefix}-{i}.xml",
+                     "lastSubmitted": "2021-03-01T10:00:00.000Z",
+                     "isPending": False,
+                     "isSitemapsIndex": is_index,
+                     "type": "sitemap",
+                     "lastDownloaded": "2021-03-02T10:00:00.000Z",
+                     "warnings": "0",
+                     "errors": "0",
+                     "contents": [{"type": "web", "submitted": "100", "indexed": "0"}]}
+                    for i in range(count)]
+        return 200, json.dumps({"sitemap": sitemaps})
+
+    def _inspect_url(self, request: Dict) -> Tuple[int, str]:
+        site_url = request["siteUrl"]
+        if site_url not in self.sites:
+            return self._forbidden(site_url)
+        return 200, json.dumps({"inspectionResult": {
+            "inspectionResultLink": f"https://search.google.com/search-console/inspect?id={request['inspectionUrl']}",
+            "indexStatusResult": {"verdict": "PASS",
+                                  "coverageState": "Submitted and indexed",
+                                  "robotsTxtState": "ALLOWED",
+                                  "indexingState": "INDEXING_ALLOWED",
+                                  "lastCrawlTime": "2021-03-01T10:00:00Z",
+                                  "pageFetchState": "SUCCESSFUL",
+                                  "googleCanonical": request["inspectionUrl"],
+                                  "userCanonical": request["inspectionUrl"],
+                                  "sitemap": [f"{site_url.rstrip('/')}/sitemap-0.xml"],
+                                  "crawledAs": "MOBILE"},
+            "mobileUsabilityResult": {"verdict": "PASS"}}})
+
+    def _forbidden(self, site_url: str) -> Tuple[int, str]:
+        return self._error(403, "forbidden", f"User does not have sufficient permission for site '{site_url}'.")
+
+    @staticmethod
+    def _error(status: int, reason: str, message: str) -> Tuple[int, str]:
+        return status, json.dumps({"error": {"code": status, "message": message,
+                                             "errors": [{"message": message, "domain": "global", "reason": reason}]}})
+
+
+@lru_cache(maxsize=64)
+def get_page(dimensions: Tuple[str, ...], start_date: str, end_date: str, start_row: int, row_count: int) -> bytes:
+    """Returns an encoded page of rows, pages are cached as repeated queries are common in benchmarks."""
+    first_day = date.fromisoformat(start_date)
+    days = (date.fromisoformat(end_date) - first_day).days + 1
+    rows = []
+    for row_index in range(start_row, start_row + row_count):
+        keys = [str(first_day + timedelta(days=row_index % days)) if dimension == "date"
+                else f"{dimension}-{row_index}" for dimension in dimensions]
+        rows.append({"keys": keys, "clicks": row_index % 7, "impressions": row_index % 7 + 10,
+                     "ctr": (row_index % 7) / (row_index % 7 + 10), "position": 1.0 + row_index % 50})
+    return json.dumps({"rows": rows, "responseAggregationType": "byPage"}).encode("utf-8")
@@ -0,0 +1,199 @@
+import socket
+import unittest
+import mock
+from datetime import date, datetime, timedelta
+
+from googleapiclient.errors import HttpError
+from httplib2 import Response
+
+from google_search_console import GoogleSearchConsoleClient, ClientTimeoutError, split_date_range
+from google_search_console.client import API_ROW_LIMIT, prefetch
+from google_search_console.response_cache import ResponseCache
+from tests.simulator import SearchConsoleSimulator
+
+
+def create_client(service) -> GoogleSearchConsoleClient:
+    with mock.patch("google_search_console.client.discovery.build_from_document", return_value=service):
+        return GoogleSearchConsoleClient(mock.MagicMock())
+
+
+def forbidden_error() -> HttpError:
+    return HttpError(Response({"status": 403}), b"{}")
+
+
+def rate_limit_error() -> HttpError:
+    return HttpError(Response({"status": 429, "retry-after": "2"}),
+                     b'{"error": {"errors": [{"reason": "rateLimitExceeded"}], "message": "Rate limit"}}')
+
+
+class TestSplitDateRange(unittest.TestCase):
+
+    def test_split_by_single_day(self):
+        shards = split_date_range(date(2021, 3, 1), date(2021, 3, 3), 1)
+        self.assertEqual(shards, [(date(2021, 3, 1), date(2021, 3, 1)),
+                                  (date(2021, 3, 2), date(2021, 3, 2)),
+                                  (date(2021, 3, 3), date(2021, 3, 3))])
+
+    def test_last_shard_is_truncated(self):
+        shards = split_date_range(date(2021, 3, 1), date(2021, 3, 5), 2)
+        self.assertEqual(shards, [(date(2021, 3, 1), date(2021, 3, 2)),
+                                  (date(2021, 3, 3), date(2021, 3, 4)),
+                                  (date(2021, 3, 5), date(2021, 3, 5))])
+
+
+class TestPropertyResolver(unittest.TestCase):
+
+    def test_resolves_property_from_site_list_once(self):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {"siteEntry": [
+            {"siteUrl": "https://www.keboola.com/", "permissionLevel": "siteOwner"}]}
+        service.searchanalytics().query().execute.return_value = {"rows": []}
+        client = create_client(service)
+
+        client.execute_search_analytics_request(service, "keboola.com", {})
+        client.execute_search_analytics_request(service, "keboola.com", {})
+
+        self.assertEqual(client.resolved_properties, {"keboola.com": "https://www.keboola.com/"})
+        self.assertEqual(service.sites().list().execute.call_count, 1)
+        service.searchanalytics().query.assert_called_with(siteUrl="https://www.keboola.com/", body={})
+
+    def test_probes_variants_when_site_is_not_listed(self):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {}
+        service.sites().get().execute.side_effect = [forbidden_error(), {"permissionLevel": "siteFullUser"}]
+        client = create_client(service)
+
+        self.assertEqual(client.resolve_property("keboola.com"), "sc-domain:keboola.com")
+
+    def test_cached_property_is_resolved_again_when_access_is_denied(self):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {"siteEntry": [
+            {"siteUrl": "sc-domain:keboola.com", "permissionLevel": "siteOwner"}]}
+        service.searchanalytics().query().execute.side_effect = [forbidden_error(), {"rows": []}]
+        client = create_client(service)
+        client.set_resolved_property("keboola.com", "http://keboola.com/")
+
+        self.assertEqual(client.execute_search_analytics_request(service, "keboola.com", {}), {"rows": []})
+        self.assertEqual(client.resolved_properties, {"keboola.com": "sc-domain:keboola.com"})
+
+
+class TestQuotaRetries(unittest.TestCase):
+
+    @mock.patch("google_search_console.rate_limiter.time.sleep")
+    def test_quota_error_is_retried_after_retry_after(self, sleep):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {"siteEntry": [
+            {"siteUrl": "sc-domain:keboola.com", "permissionLevel": "siteOwner"}]}
+        service.searchanalytics().query().execute.side_effect = [rate_limit_error(), {"rows": []}]
+        client = create_client(service)
+
+        self.assertEqual(client.execute_search_analytics_request(service, "keboola.com", {}), {"rows": []})
+        self.assertAlmostEqual(sleep.call_args[0][0], 2, places=1)
+        self.assertEqual(client.search_analytics_rate_limiter.rate_ratio, 0.55)
+
+
+class TestRequestMetrics(unittest.TestCase):
+
+    def test_timed_out_request_is_recorded_as_error(self):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {"siteEntry": [
+            {"siteUrl": "sc-domain:keboola.com", "permissionLevel": "siteOwner"}]}
+        service.searchanalytics().query().methodId = "webmasters.searchanalytics.query"
+        service.searchanalytics().query().execute.side_effect = socket.timeout("timed out")
+        client = create_client(service)
+
+        with self.assertRaises(ClientTimeoutError):
+            client.execute_search_analytics_request(service, "keboola.com", {})
+
+        totals = client.metrics.get_totals("webmasters.searchanalytics.query")
+        self.assertEqual((totals.count, totals.errors), (1, 1))
+
+
+class TestPrefetch(unittest.TestCase):
+
+    def test_prefetched_pages_keep_order_and_stop_on_short_page(self):
+        service = mock.MagicMock()
+        service.sites().list().execute.return_value = {"siteEntry": [
+            {"siteUrl": "sc-domain:keboola.com", "permissionLevel": "siteOwner"}]}
+        service.searchanalytics().query().execute.side_effect = [{"rows": [{"keys": ["a"]}] * API_ROW_LIMIT},
+                                                                 {"rows": [{"keys": ["b"]}] * 10}]
+        client = create_client(service)
+
+        pages = list(client.get_result_pages({}, "keboola.com", prefetch_pages=2))
+
+        self.assertEqual([len(page) for page in pages], [API_ROW_LIMIT, 10])
+        self.assertEqual(service.searchanalytics().query().execute.call_count, 2)
+
+    def test_producer_error_is_raised_in_consumer(self):
+        def failing_pages():
+            yield 1
+            raise ValueError("failed")
+
+        pages = prefetch(failing_pages(), 1)
+        self.assertEqual(next(pages), 1)
+        with self.assertRaises(ValueError):
+            next(pages)
+
+
+class TestAuthorization(unittest.TestCase):
+
+    @mock.patch("google_search_console.client.Credentials.refresh")
+    def test_cached_access_token_is_reused_until_expiry(self, refresh):
+        client = GoogleSearchConsoleClient.from_auth_code("id", "secret", "refresh", access_token="token",
+                                                          expiry=datetime.utcnow() + timedelta(minutes=30),
+                                                          http=mock.MagicMock())
+        refresh.assert_not_called()
+        self.assertEqual(client.access_token[0], "token")
+
+        GoogleSearchConsoleClient.from_auth_code("id", "secret", "refresh", access_token="token",
+                                                 expiry=datetime.utcnow() - timedelta(minutes=1),
+                                                 http=mock.MagicMock())
+        refresh.assert_called_once()
+
+
+class TestSimulatedApi(unittest.TestCase):
+
+    def test_pages_are_fetched_from_probed_url_prefix_property(self):
+        simulator = SearchConsoleSimulator(["https://www.keboola.com/"], rows_per_query=API_ROW_LIMIT + 10,
+                                           quota_errors=1, list_sites=False)
+        client = GoogleSearchConsoleClient(None, http=simulator)
+
+        pages = list(client.get_search_analytics_data(date(2021, 3, 1), date(2021, 3, 2), "keboola.com",
+                                                      ["date", "query"], filter_groups=[]))
+
+        self.assertEqual([len(page) for page in pages], [API_ROW_LIMIT, 10])
+        self.assertEqual(pages[0][1]["keys"], ["2021-03-02", "query-1"])
+        self.assertEqual(client.resolved_properties, {"keboola.com": "https://www.keboola.com/"})
+        self.assertEqual(simulator.request_counts["searchanalytics.query"], 3)
+        self.assertEqual(simulator.request_counts["sites.get"], 3)
+        # sequential requests reuse one pooled transport
+        self.assertEqual(client._idle_http.qsize(), 1)
+
+    def test_stale_cached_property_is_resolved_again_for_url_inspection(self):
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"])
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        client.set_resolved_property("keboola.com", "https://www.keboola.com/")
+
+        result = client.inspect_url("keboola.com", "https://www.keboola.com/a")
+
+        self.assertEqual(result["indexStatusResult"]["verdict"], "PASS")
+        self.assertEqual(client.resolved_properties, {"keboola.com": "sc-domain:keboola.com"})
+        self.assertEqual(simulator.request_counts["urlInspection.index.inspect"], 2)
+
+    def test_repeated_historical_queries_are_served_from_response_cache(self):
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"], rows_per_query=10)
+        client = GoogleSearchConsoleClient(None, http=simulator, response_cache=ResponseCache())
+
+        for include_fresh in [False, False, True]:
+            pages = list(client.get_search_analytics_data(date(2021, 3, 1), date(2021, 3, 2), "keboola.com",
+                                                          ["date", "query"], filter_groups=[],
+                                                          include_fresh=include_fresh))
+            self.assertEqual([len(page) for page in pages], [10])
+
+        # the second query is served from the cache, fresh data always goes to the API
+        self.assertEqual(simulator.request_counts["searchanalytics.query"], 2)
+        self.assertEqual(client.metrics.get_totals("response_cache.hit").rows, 10)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,12 +3,65 @@ Created on 12. 11. 2018
 
 @author: esner
 '''
+import gzip
+import json
+import tempfile
 import unittest
 import mock
 import os
+from datetime import date, timedelta
+from typing import Callable, Optional, Tuple
 from freezegun import freeze_time
+from keboola.component.base import UserException
 
-from component import Component
+from component import Component, SearchAnalyticsQuery
+from google_search_console.client import API_ROW_LIMIT, MAX_RETRIES
+from google_search_console.response_cache import ResponseCache
+from google_search_console import GoogleSearchConsoleClient, ClientError, ClientTimeoutError
+from tests.simulator import SearchConsoleSimulator
+from writers import CsvSliceWriter
+
+
+def create_data_dir(parameters: dict) -> str:
+    data_dir = tempfile.mkdtemp()
+    for folder in ["in", "out/tables", "out/files"]:
+        os.makedirs(os.path.join(data_dir, folder))
+    with open(os.path.join(data_dir, "config.json"), "w") as config_file:
+        json.dump({"parameters": parameters}, config_file)
+    return data_dir
+
+
+def fake_search_analytics_pages(start_date, end_date, url, dimensions, *args, **kwargs):
+    day = start_date
+    while day <= end_date:
+        yield [{"keys": [str(day), "keboola"], "clicks": 1, "impressions": 2, "ctr": 0.5, "position": 1.0}]
+        day += timedelta(days=1)
+
+
+SEARCH_ANALYTICS_PARAMETERS = {"domain": "keboola.com",
+                               "endpoint": "Search analytics",
+                               "out_table_name": "analytics",
+                               "search_analytics_dimensions": "date, query",
+                               "date_range": "Custom",
+                               "date_from": "2021-03-01",
+                               "date_to": "2021-03-02"}
+
+
+def run_search_analytics(parameters: dict, pages: Callable = fake_search_analytics_pages,
+                         state: Optional[dict] = None) -> Tuple[str, Component, mock.MagicMock]:
+    """
+    Extracts search analytics of SEARCH_ANALYTICS_PARAMETERS updated by parameters from a mocked client serving pages.
+    Returns the data directory, the component and the client.
+    """
+    data_dir = create_data_dir({**SEARCH_ANALYTICS_PARAMETERS, **parameters})
+    client = mock.MagicMock()
+    client.get_search_analytics_data.side_effect = pages
+    with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+        comp = Component()
+        if state is not None:
+            comp.state = state
+        comp.fetch_and_write_search_analytics_data(client, comp.get_domains(client))
+    return data_dir, comp, client
 
 
 class TestComponent(unittest.TestCase):
@@ -22,6 +75,348 @@ class TestComponent(unittest.TestCase):
             comp = Component()
             comp.run()
 
+    @freeze_time("2010-10-10")
+    def test_date_sharded_extraction_writes_slice_per_shard(self):
+        data_dir, _, client = run_search_analytics({"date_to": "2021-03-04",
+                                                    "extraction_options": {"date_shard_days": 1, "max_workers": 2}})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(client.get_search_analytics_data.call_count, 4)
+        self.assertEqual(sorted(os.listdir(table_path)), ["0_0", "1_0", "2_0", "3_0"])
+        with open(table_path + ".manifest") as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(manifest["primary_key"], ["date", "query"])
+        self.assertEqual(manifest["columns"][:6], ["date", "query", "clicks", "impressions", "ctr", "position"])
+        with open(os.path.join(table_path, "0_0")) as slice_file:
+            self.assertEqual(slice_file.read().splitlines(),
+                             ["2021-03-01,keboola,1,2,0.5,1.0,2010-10-10,keboola.com"])
+
+    @freeze_time("2021-03-06")
+    def test_incremental_fetching_starts_after_last_finalized_date(self):
+        state = {"last_finalized_dates": {"keboola.com|date,query|": "2021-03-02"}}
+        _, comp, client = run_search_analytics({"date_to": "2021-03-04",
+                                                "loading_options": {"incremental": 1, "incremental_fetching": True}},
+                                               state=state)
+
+        date_from, date_to = client.get_search_analytics_data.call_args[0][:2]
+        self.assertEqual((str(date_from), str(date_to)), ("2021-03-03", "2021-03-04"))
+        self.assertEqual(comp.state["last_finalized_dates"], {"keboola.com|date,query|": "2021-03-03"})
+
+    def test_batch_mode_writes_all_domains_into_one_table(self):
+        data_dir, _, client = run_search_analytics({"domain": "", "domains": ["keboola.com", "sc-domain:keboola.cz"]})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(sorted(call[0][2] for call in client.get_search_analytics_data.call_args_list),
+                         ["keboola.com", "sc-domain:keboola.cz"])
+        self.assertEqual(sorted(os.listdir(table_path)), ["0_0", "0_1", "1_0", "1_1"])
+        with open(table_path + ".manifest") as manifest_file:
+            self.assertEqual(json.load(manifest_file)["primary_key"], ["date", "query", "domain"])
+
+    def test_truncated_queries_are_partitioned_by_day_and_device(self):
+        data_dir, _, client = run_search_analytics({"search_analytics_dimensions": "date, device",
+                                                    "extraction_options": {"partitioning": True,
+                                                                           "partition_row_threshold": 1}})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(sorted(os.listdir(table_path)),
+                         ["0-0-0_0", "0-0-1_0", "0-0-2_0", "0-1-0_0", "0-1-1_0", "0-1-2_0"])
+        filter_groups = [call[0][5] for call in client.get_search_analytics_data.call_args_list]
+        self.assertIn([[{"dimension": "device", "operator": "equals", "expression": "TABLET"}]], filter_groups)
+
+    def test_multi_day_queries_are_not_partitioned_by_their_cumulative_row_count(self):
+        data_dir, _, client = run_search_analytics({"search_analytics_dimensions": "date, device",
+                                                    "date_to": "2021-03-03",
+                                                    "extraction_options": {"partitioning": True,
+                                                                           "partition_row_threshold": 2}})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(client.get_search_analytics_data.call_count, 1)
+        self.assertEqual(sorted(os.listdir(table_path)), ["0_0", "0_1", "0_2"])
+
+    def test_resumed_queries_count_the_rows_of_fetched_pages(self):
+        def pages(start_date, end_date, url, dimensions, *args, start_row=0, **kwargs):
+            if dimensions == ["country"]:
+                yield [{"keys": ["cze"]}, {"keys": ["svk"]}][start_row:]
+            else:
+                yield from fake_search_analytics_pages(start_date, end_date, url, dimensions)
+
+        day = date(2021, 3, 1)
+        query = SearchAnalyticsQuery("0", "keboola.com", day, day, start_row=2 * API_ROW_LIMIT)
+        for dimension, values in [("device", ["DESKTOP", "MOBILE", "TABLET"]), ("country", ["cze", "svk"])]:
+            with self.subTest(dimension=dimension):
+                data_dir = create_data_dir({**SEARCH_ANALYTICS_PARAMETERS,
+                                            "search_analytics_dimensions": f"date, {dimension}",
+                                            "extraction_options": {"partitioning": True}})
+                client = mock.MagicMock()
+                client.get_search_analytics_data.side_effect = pages
+                with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+                    comp = Component()
+                    partitions = comp.fetch_and_write_search_analytics_query(client, tempfile.mkdtemp(),
+                                                                             CsvSliceWriter(), query,
+                                                                             ["date", dimension], None, day)
+
+                self.assertEqual([partition.partition_filters for partition in partitions],
+                                 [((dimension, value),) for value in values])
+                self.assertEqual({partition.start_row for partition in partitions}, {0})
+
+    def test_each_filter_group_is_fetched_and_overlapping_rows_are_removed(self):
+        data_dir, _, client = run_search_analytics({"filter_groups": [
+            [{"dimension": "query", "operator": "contains", "expression": "keboola"}],
+            [{"dimension": "query", "operator": "contains", "expression": "bola"}]]})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(client.get_search_analytics_data.call_count, 2)
+        self.assertEqual(len(os.listdir(table_path)), 2)
+        rows = []
+        for slice_name in os.listdir(table_path):
+            with open(os.path.join(table_path, slice_name)) as slice_file:
+                rows.extend(slice_file.read().splitlines())
+        self.assertEqual(len(rows), 2)
+
+    def test_each_report_is_written_into_its_own_table(self):
+        data_dir, _, client = run_search_analytics({"domain": "", "domains": ["keboola.com", "keboola.cz"],
+                                                    "reports": [{"name": "daily", "dimensions": "date"},
+                                                                {"name": "queries", "dimensions": "date, query",
+                                                                 "search_type": "image",
+                                                                 "out_table_name": "image_queries"}],
+                                                    "extraction_options": {"date_shard_days": 1}})
+
+        calls = sorted((call[0][2], tuple(call[0][3]), call[0][4])
+                       for call in client.get_search_analytics_data.call_args_list)
+        self.assertEqual(calls, sorted(2 * [("keboola.com", ("date",), None), ("keboola.cz", ("date",), None),
+                                            ("keboola.com", ("date", "query"), "image"),
+                                            ("keboola.cz", ("date", "query"), "image")]))
+        tables_path = os.path.join(data_dir, "out", "tables")
+        self.assertEqual(sorted(os.listdir(os.path.join(tables_path, "analytics_daily.csv"))),
+                         ["0_0", "1_0", "2_0", "3_0"])
+        self.assertEqual(sorted(os.listdir(os.path.join(tables_path, "image_queries.csv"))),
+                         ["4_0", "5_0", "6_0", "7_0"])
+        with open(os.path.join(tables_path, "image_queries.csv.manifest")) as manifest_file:
+            self.assertEqual(json.load(manifest_file)["primary_key"], ["date", "query", "domain"])
+        with open(os.path.join(tables_path, "analytics_daily.csv.manifest")) as manifest_file:
+            self.assertEqual(json.load(manifest_file)["columns"][:2], ["date", "clicks"])
+
+    def test_query_plan_shards_large_extracts_and_dry_run_writes_only_the_plan(self):
+        parameters = {"date_to": "2021-03-10",
+                      "filter_groups": [[{"dimension": "country", "operator": "equals", "expression": "cze"}]],
+                      "extraction_options": {"query_planning": True}}
+
+        def pages(start_date, end_date, url, dimensions, *args, **kwargs):
+            if dimensions == ["date"]:
+                yield [{"keys": [f"2021-03-{day:02}"], "impressions": 20000} for day in range(1, 11)]
+            elif start_date == end_date:
+                # the sample covers 1000 of the 20000 impressions of the day, so the day is estimated to 20000 rows
+                # and 5 days fit into a shard of 100000 rows
+                yield [{"impressions": 1}] * kwargs["row_limit"]
+            else:
+                yield from fake_search_analytics_pages(start_date, end_date, url, dimensions)
+
+        _, _, client = run_search_analytics(parameters, pages)
+        calls = client.get_search_analytics_data.call_args_list
+        date_ranges = [tuple(str(day) for day in call[0][:2]) for call in calls]
+        self.assertEqual(date_ranges[2:], [("2021-03-01", "2021-03-05"), ("2021-03-06", "2021-03-10")])
+        self.assertEqual(calls[1][1]["row_limit"], 1000)
+        self.assertEqual([call[0][5] for call in calls[:2]], [[parameters["filter_groups"][0]]] * 2)
+
+        data_dir, _, _ = run_search_analytics({**parameters, "extraction_options": {"dry_run": True}}, pages)
+        tables_path = os.path.join(data_dir, "out", "tables")
+        self.assertEqual(sorted(os.listdir(tables_path)),
+                         ["analytics_query_plan.csv", "analytics_query_plan.csv.manifest"])
+        with open(os.path.join(tables_path, "analytics_query_plan.csv")) as plan_file:
+            self.assertEqual(plan_file.read().splitlines(),
+                             [",keboola.com,2021-03-01,2021-03-10,10,20000,200000,5,2,10"])
+
+    def test_gzip_output_writes_compressed_slices_and_column_types(self):
+        data_dir, _, _ = run_search_analytics({"date_to": "2021-03-01",
+                                               "loading_options": {"incremental": 0, "output_format": "csv_gzip"}})
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(os.listdir(table_path), ["0_0.gz"])
+        with gzip.open(os.path.join(table_path, "0_0.gz"), "rt") as slice_file:
+            self.assertTrue(slice_file.read().startswith("2021-03-01,keboola,1,2,0.5,1.0,"))
+        with open(table_path + ".manifest") as manifest_file:
+            column_metadata = json.load(manifest_file)["column_metadata"]
+        self.assertIn({"key": "KBC.datatype.basetype", "value": "INTEGER"}, column_metadata["clicks"])
+        self.assertIn({"key": "KBC.datatype.basetype", "value": "FLOAT"}, column_metadata["position"])
+
+    @mock.patch.dict(os.environ, {'KBC_RUNID': '123'})
+    def test_run_metrics_are_written_for_simulated_api(self):
+        data_dir = create_data_dir({**SEARCH_ANALYTICS_PARAMETERS, "extraction_options": {"run_metrics": True}})
+        client = GoogleSearchConsoleClient(None, http=SearchConsoleSimulator(["sc-domain:keboola.com"],
+                                                                             rows_per_query=30000))
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            comp.fetch_and_write_search_analytics_data(client, ["keboola.com"])
+            comp.write_run_metrics(client.metrics)
+
+        summary = comp.get_run_metrics_summary(client.metrics)
+        self.assertIn("3 API requests (0 failed)", summary)
+        self.assertIn("writing 30000 rows", summary)
+        with open(os.path.join(data_dir, "out", "tables", "analytics_run_metrics.csv")) as metrics_file:
+            rows = [line.split(",") for line in metrics_file.read().splitlines()]
+        query_row = next(row for row in rows if row[1] == "webmasters.searchanalytics.query")
+        self.assertEqual(query_row[:4], ["123", "webmasters.searchanalytics.query", "sc-domain:keboola.com", "2"])
+        self.assertEqual(query_row[-1], "30000")
+
+    def test_failed_extraction_is_resumed_from_checkpoint(self):
+        parameters = {"date_to": "2021-03-01",
+                      "loading_options": {"incremental": 1},
+                      "extraction_options": {"checkpointing": True}}
+
+        def failing_pages(*args, **kwargs):
+            yield from fake_search_analytics_pages(*args, **kwargs)
+            raise ClientError("Connection timed out, please try a smaller query")
+
+        data_dir, comp, _ = run_search_analytics(parameters, failing_pages)
+        checkpoint = comp.state["checkpoint"]
+        self.assertEqual([query["start_row"] for query in checkpoint["queries"]], [25000])
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(os.listdir(table_path), ["0_0"])
+
+        data_dir, comp, client = run_search_analytics(parameters, state={"checkpoint": checkpoint})
+        self.assertEqual(client.get_search_analytics_data.call_args[1]["start_row"], 25000)
+        self.assertEqual(os.listdir(os.path.join(data_dir, "out", "tables", "analytics.csv")), ["0_1"])
+        self.assertNotIn("checkpoint", comp.state)
+
+    def test_timed_out_queries_are_bisected_down_to_single_days(self):
+        def slow_pages(start_date, end_date, *args, **kwargs):
+            if start_date < end_date:
+                raise ClientTimeoutError("Connection timed out, please try a smaller query")
+            yield from fake_search_analytics_pages(start_date, end_date, *args, **kwargs)
+
+        data_dir, _, client = run_search_analytics({"date_to": "2021-03-04"}, slow_pages)
+
+        table_path = os.path.join(data_dir, "out", "tables", "analytics.csv")
+        self.assertEqual(sorted(os.listdir(table_path)), ["0-0-0_0", "0-0-1_0", "0-1-0_0", "0-1-1_0"])
+        self.assertEqual(client.get_search_analytics_data.call_count, 7)
+
+    def test_unchanged_response_cache_is_uploaded_again_before_it_expires(self):
+        archive_cache = ResponseCache()
+        archive_cache.put("a", {"rows": []})
+        data_dir = create_data_dir(SEARCH_ANALYTICS_PARAMETERS)
+        os.makedirs(os.path.join(data_dir, "in", "files"))
+        archive_path = os.path.join(data_dir, "in", "files", "1_google_search_console_response_cache.tar")
+        archive_cache.save_archive(archive_path)
+        with open(archive_path + ".manifest", "w") as manifest_file:
+            json.dump({"id": 1, "name": "google_search_console_response_cache.tar",
+                       "created": "2021-03-01T10:00:00+0000", "tags": ["google-search-console-response-cache"]},
+                      manifest_file)
+
+        for today, uploaded in [("2021-03-10", False), ("2021-03-12", True)]:
+            with self.subTest(today=today), freeze_time(today), mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+                comp = Component()
+                response_cache = comp.load_response_cache()
+                self.assertEqual(response_cache.get("a"), {"rows": []})
+                comp.save_response_cache(response_cache)
+
+                self.assertEqual(os.listdir(os.path.join(data_dir, "out", "files")) != [], uploaded)
+
+    def test_batch_mode_sitemaps_keep_all_sitemaps_of_every_domain(self):
+        data_dir = create_data_dir({"domains": ["keboola.com", "keboola.cz"],
+                                    "endpoint": "Sitemaps",
+                                    "out_table_name": "sitemaps"})
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com", "sc-domain:keboola.cz"], sitemaps_per_site=3)
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            comp.fetch_and_write_sitemaps_data(client, comp.get_domains(client))
+
+        table_path = os.path.join(data_dir, "out", "tables", "sitemaps.csv")
+        with open(table_path + ".manifest") as manifest_file:
+            manifest = json.load(manifest_file)
+        self.assertEqual(manifest["primary_key"], ["domain", "path", "content_type"])
+        rows = []
+        for slice_name in os.listdir(table_path):
+            with open(os.path.join(table_path, slice_name)) as slice_file:
+                rows.extend(line.split(",") for line in slice_file.read().splitlines())
+        key_indexes = [manifest["columns"].index(column) for column in manifest["primary_key"]]
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(len({tuple(row[index] for index in key_indexes) for row in rows}), 6)
+
+    @mock.patch("google_search_console.rate_limiter.time.sleep")
+    def test_exhausted_sitemaps_quota_is_a_user_error(self, sleep):
+        data_dir = create_data_dir({"domain": "keboola.com",
+                                    "endpoint": "Sitemaps",
+                                    "out_table_name": "sitemaps"})
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"], sitemaps_quota_errors=MAX_RETRIES + 1)
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            with self.assertRaisesRegex(UserException, "API quota exceeded"):
+                comp.fetch_and_write_sitemaps_data(client, ["keboola.com"])
+
+        self.assertEqual(simulator.request_counts["sitemaps.list"], MAX_RETRIES + 1)
+
+    def test_sitemap_indexes_are_expanded_into_child_sitemaps(self):
+        data_dir = create_data_dir({"domain": "keboola.com",
+                                    "endpoint": "Sitemaps",
+                                    "out_table_name": "sitemaps",
+                                    "expand_sitemap_indexes": True})
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"], sitemaps_per_site=2, sitemaps_per_index=3)
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            comp.fetch_and_write_sitemaps_data(client, ["keboola.com"])
+
+        self.assertEqual(simulator.request_counts["sitemaps.list"], 3)
+        with open(os.path.join(data_dir, "out", "tables", "sitemaps.csv", "0")) as slice_file:
+            rows = [line.split(",") for line in slice_file.read().splitlines()]
+        self.assertEqual(len(rows), 8)
+        self.assertEqual(rows[2][0], "sc-domain:keboola.com/sitemap-0-0.xml")
+        self.assertEqual(rows[2][8], "sc-domain:keboola.com/sitemap-0.xml")
+
+    def test_error_while_expanding_sitemap_index_is_a_user_error(self):
+        data_dir = create_data_dir({"domain": "keboola.com",
+                                    "endpoint": "Sitemaps",
+                                    "out_table_name": "sitemaps",
+                                    "expand_sitemap_indexes": True})
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"], sitemaps_per_site=2, sitemaps_per_index=3,
+                                           invalid_sitemap_indexes=["sc-domain:keboola.com/sitemap-1.xml"])
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            with self.assertRaisesRegex(UserException, "Request contains an invalid argument"):
+                comp.fetch_and_write_sitemaps_data(client, ["keboola.com"])
+
+    @freeze_time("2021-03-06")
+    def test_url_inspection_skips_recently_inspected_urls(self):
+        data_dir = create_data_dir({"domain": "keboola.com",
+                                    "endpoint": "URL inspection",
+                                    "out_table_name": "inspections",
+                                    "url_inspection": {"urls": ["https://www.keboola.com/a",
+                                                                "https://www.keboola.com/b"],
+                                                       "cache_days": 7}})
+        simulator = SearchConsoleSimulator(["sc-domain:keboola.com"])
+        client = GoogleSearchConsoleClient(None, http=simulator)
+        with mock.patch.dict(os.environ, {'KBC_DATADIR': data_dir}):
+            comp = Component()
+            comp.state = {"url_inspections": {"keboola.com": {"https://www.keboola.com/a": "2021-03-05",
+                                                              "https://www.keboola.com/old": "2021-02-01"}}}
+            comp.fetch_and_write_url_inspection_data(client, ["keboola.com"])
+
+        self.assertEqual(simulator.request_counts["urlInspection.index.inspect"], 1)
+        with open(os.path.join(data_dir, "out", "tables", "inspections.csv", "0_0")) as slice_file:
+            rows = [line.split(",") for line in slice_file.read().splitlines()]
+        self.assertEqual([row[:3] for row in rows], [["https://www.keboola.com/b", "PASS", "Submitted and indexed"]])
+        self.assertEqual(comp.state["url_inspections"], {"keboola.com": {"https://www.keboola.com/a": "2021-03-05",
+                                                                         "https://www.keboola.com/b": "2021-03-06"}})
+
+    def test_search_analytics_page_is_parsed_into_typed_columns(self):
+        page = [{"keys": ["2021-03-01", "keboola"], "clicks": 1.0, "impressions": 3.0, "ctr": 0.3, "position": 2},
+                {"keys": ["2021-03-02", "kbc"], "clicks": 0.0, "impressions": 0.0, "ctr": 0.0, "position": 1}]
+
+        columns = Component.parse_search_analytics_page(page, 2, recompute_ctr=True)
+
+        self.assertEqual(columns, [("2021-03-01", "2021-03-02"), ("keboola", "kbc"), [1, 0], [3, 0], [1 / 3, 0.0],
+                                   [2.0, 1.0]])
+        self.assertIsInstance(columns[2][0], int)
+        self.assertEqual(Component.parse_search_analytics_page([], 2), [(), (), [], [], [], []])
+
+    @freeze_time("2021-03-06")
+    def test_parse_date_accepts_iso_and_relative_dates(self):
+        self.assertEqual(str(Component.parse_date("2021-03-01")), "2021-03-01")
+        self.assertEqual(str(Component.parse_date("3 days ago")), "2021-03-03")
+
 
 if __name__ == "__main__":
     # import sys;sys.argv = ['', 'Test.testName']
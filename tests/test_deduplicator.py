@@ -0,0 +1,36 @@
+import tempfile
+import unittest
+
+from deduplicator import RowDeduplicator
+
+
+def rows(*keys):
+    return [{"keys": [key], "clicks": 1} for key in keys]
+
+
+class TestRowDeduplicator(unittest.TestCase):
+
+    def test_filters_rows_seen_before(self):
+        deduplicator = RowDeduplicator()
+        new_rows, _ = deduplicator.filter_new("keboola.com", rows("a", "b"))
+        self.assertEqual(len(new_rows), 2)
+        new_rows, _ = deduplicator.filter_new("keboola.com", rows("b", "c", "c"))
+        self.assertEqual(new_rows, rows("c"))
+        new_rows, _ = deduplicator.filter_new("keboola.cz", rows("a"))
+        self.assertEqual(new_rows, rows("a"))
+
+    def test_spills_to_disk_and_forgets_discarded_rows(self):
+        deduplicator = RowDeduplicator(spill_threshold=2, spill_directory=tempfile.mkdtemp())
+        _, digests = deduplicator.filter_new("keboola.com", rows("a", "b", "c"))
+        self.assertIsNotNone(deduplicator._connection)
+        new_rows, _ = deduplicator.filter_new("keboola.com", rows("a", "d"))
+        self.assertEqual(new_rows, rows("d"))
+
+        deduplicator.forget(digests[:1])
+        new_rows, _ = deduplicator.filter_new("keboola.com", rows("a", "b"))
+        self.assertEqual(new_rows, rows("a"))
+        deduplicator.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import mock
+
+from google_search_console.rate_limiter import RateLimiter, TokenBucket
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_waits_only_after_burst_is_spent(self):
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.reserve(bucket.updated), 0.0)
+        self.assertAlmostEqual(bucket.reserve(bucket.updated), 1.0)
+
+
+class TestRateLimiter(unittest.TestCase):
+
+    def test_throttling_halves_rate_and_success_recovers_it(self):
+        limiter = RateLimiter(1200, 1200)
+        limiter.acquire("sc-domain:keboola.com")
+
+        limiter.on_throttled()
+        self.assertEqual(limiter.user_bucket.rate, 10)
+        self.assertEqual(limiter.site_buckets["sc-domain:keboola.com"].rate, 10)
+
+        for _ in range(20):
+            limiter.on_success()
+        self.assertEqual(limiter.user_bucket.rate, 20)
+
+    def test_retry_after_is_honoured_and_backoff_grows(self):
+        limiter = RateLimiter(1200)
+        self.assertEqual(limiter.on_throttled(retry_after=7), 7)
+        self.assertEqual(limiter.on_throttled(), 2)
+
+    @mock.patch("google_search_console.rate_limiter.time.sleep")
+    def test_acquire_waits_for_pause(self, sleep):
+        limiter = RateLimiter(1200)
+        limiter.on_throttled(retry_after=5)
+        limiter.acquire()
+        self.assertAlmostEqual(sleep.call_args[0][0], 5, places=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+from freezegun import freeze_time
+
+from google_search_console.response_cache import ResponseCache
+
+REQUEST = {"startDate": "2021-03-01", "endDate": "2021-03-02", "dimensions": ["date"], "rowLimit": 25000,
+           "startRow": 0}
+
+
+class TestResponseCache(unittest.TestCase):
+
+    @freeze_time("2021-03-06")
+    def test_only_final_data_is_cacheable(self):
+        self.assertTrue(ResponseCache.is_cacheable(REQUEST))
+        self.assertTrue(ResponseCache.is_cacheable({**REQUEST, "endDate": "2021-03-03"}))
+        self.assertFalse(ResponseCache.is_cacheable({**REQUEST, "endDate": "2021-03-04"}))
+        self.assertFalse(ResponseCache.is_cacheable({**REQUEST, "dataState": "all"}))
+
+    def test_keys_differ_by_site_and_start_row(self):
+        key = ResponseCache.get_key("sc-domain:keboola.com", REQUEST)
+        self.assertEqual(key, ResponseCache.get_key("sc-domain:keboola.com", dict(reversed(list(REQUEST.items())))))
+        self.assertNotEqual(key, ResponseCache.get_key("https://www.keboola.com/", REQUEST))
+        self.assertNotEqual(key, ResponseCache.get_key("sc-domain:keboola.com", {**REQUEST, "startRow": 25000}))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        response_cache = ResponseCache(max_bytes=10 ** 9)
+        for key in ["a", "b", "c"]:
+            response_cache.put(key, {"rows": [{"keys": [key * 1000]}]})
+        entry_size = response_cache.size // 3
+        os.utime(os.path.join(response_cache.directory, "a.json.gz"), (0, 0))
+        os.utime(os.path.join(response_cache.directory, "b.json.gz"), (1, 1))
+        self.assertIsNotNone(response_cache.get("a"))
+
+        response_cache.max_bytes = entry_size * 2
+        response_cache.evict()
+
+        self.assertIsNone(response_cache.get("b"))
+        self.assertEqual(response_cache.get("a"), {"rows": [{"keys": ["a" * 1000]}]})
+        self.assertEqual((response_cache.hits, response_cache.misses), (2, 1))
+
+    def test_archive_restores_entries(self):
+        response_cache = ResponseCache()
+        response_cache.put("a", {"rows": []})
+        archive_path = os.path.join(tempfile.mkdtemp(), "cache.tar")
+        response_cache.save_archive(archive_path)
+
+        restored_cache = ResponseCache()
+        restored_cache.load_archive(archive_path)
+
+        self.assertEqual(restored_cache.get("a"), {"rows": []})
+        self.assertEqual(restored_cache.size, response_cache.size)
+        self.assertEqual((response_cache.writes, restored_cache.writes), (1, 0))
+
+    def test_close_removes_temporary_directory(self):
+        response_cache = ResponseCache()
+        response_cache.put("a", {"rows": []})
+        response_cache.close()
+        self.assertFalse(os.path.exists(response_cache.directory))
+
+        directory = tempfile.mkdtemp()
+        ResponseCache(directory).close()
+        self.assertTrue(os.path.isdir(directory))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import gzip
+import os
+import tempfile
+import unittest
+from datetime import date
+
+from writers import CsvSliceWriter, GzipCsvSliceWriter
+
+ROWS = [["2021-03-01", "keboola", 1, 2, 0.5, 1.0, date(2021, 3, 2), "keboola.com"]]
+
+
+class TestSliceWriters(unittest.TestCase):
+
+    def test_csv_and_gzip_slices_have_same_content(self):
+        table_path = tempfile.mkdtemp()
+        csv_path = CsvSliceWriter().get_slice_path(table_path, "0_0")
+        gzip_path = GzipCsvSliceWriter().get_slice_path(table_path, "1_0")
+        CsvSliceWriter().write(csv_path, ROWS)
+        GzipCsvSliceWriter().write(gzip_path, ROWS)
+
+        self.assertEqual(sorted(os.listdir(table_path)), ["0_0", "1_0.gz"])
+        with open(csv_path) as csv_file, gzip.open(gzip_path, "rt") as gzip_file:
+            self.assertEqual(csv_file.read(), gzip_file.read())
+
+    def test_columns_are_written_as_rows(self):
+        slice_path = os.path.join(tempfile.mkdtemp(), "0_0")
+        CsvSliceWriter().write_columns(slice_path, [list(column) for column in zip(*ROWS)])
+
+        with open(slice_path) as csv_file:
+            self.assertEqual(csv_file.read().splitlines(), ["2021-03-01,keboola,1,2,0.5,1.0,2021-03-02,keboola.com"])
+
+
+if __name__ == "__main__":
+    unittest.main()